@@ -0,0 +1,163 @@
+/*
+ * QueryBuilder template scanner.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stdbool.h>
+
+/* work around pypy3.9 v7.3.9 bug with Py_LIMITED_API */
+#ifdef PYPY_VERSION
+#ifndef Py_None
+#define Py_None (&_Py_NoneStruct)
+#endif
+#endif
+
+/* chars that end placeholder fields */
+static inline bool is_tag_delim(Py_UCS4 c)
+{
+	return c == '{' || c == '}' || c == ':' || c == '|';
+}
+
+/* skip field chars, return end position */
+static Py_ssize_t scan_field(const Py_UCS4 *src, Py_ssize_t pos, Py_ssize_t src_len)
+{
+	while (pos < src_len && !is_tag_delim(src[pos]))
+		pos++;
+	return pos;
+}
+
+/* substring or None for missing field */
+static PyObject *opt_substring(PyObject *str, Py_ssize_t start, Py_ssize_t end)
+{
+	if (start < 0) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	return PyUnicode_Substring(str, start, end);
+}
+
+/* append (sql, name, type, alt) tuple to list */
+static bool add_item(PyObject *list, PyObject *str, Py_ssize_t sql_start, Py_ssize_t tag_start,
+		     Py_ssize_t name_end, Py_ssize_t type_start, Py_ssize_t type_end,
+		     Py_ssize_t alt_start, Py_ssize_t alt_end)
+{
+	PyObject *item;
+	PyObject *sql = NULL, *name = NULL, *type = NULL, *alt = NULL;
+	bool ok = false;
+
+	sql = PyUnicode_Substring(str, sql_start, tag_start);
+	if (!sql)
+		goto failed;
+	name = PyUnicode_Substring(str, tag_start + 1, name_end);
+	if (!name)
+		goto failed;
+	type = opt_substring(str, type_start, type_end);
+	if (!type)
+		goto failed;
+	alt = opt_substring(str, alt_start, alt_end);
+	if (!alt)
+		goto failed;
+	item = PyTuple_Pack(4, sql, name, type, alt);
+	if (!item)
+		goto failed;
+	ok = PyList_Append(list, item) == 0;
+	Py_DECREF(item);
+failed:
+	Py_XDECREF(sql);
+	Py_XDECREF(name);
+	Py_XDECREF(type);
+	Py_XDECREF(alt);
+	return ok;
+}
+
+static PyObject *scan_template(PyObject *self, PyObject *arg)
+{
+	Py_UCS4 *src;
+	Py_ssize_t src_len, pos, sql_start, tag_start, name_end;
+	Py_ssize_t type_start, type_end, alt_start, alt_end;
+	PyObject *items = NULL, *tail = NULL, *res = NULL, *tag;
+
+	if (!PyUnicode_Check(arg)) {
+		PyErr_Format(PyExc_TypeError, "scan_template() argument must be str");
+		return NULL;
+	}
+	src_len = PyUnicode_GetLength(arg);
+	if (src_len < 0)
+		return NULL;
+	src = PyUnicode_AsUCS4Copy(arg);
+	if (!src)
+		return NULL;
+
+	items = PyList_New(0);
+	if (!items)
+		goto failed;
+
+	sql_start = 0;
+	for (pos = 0; pos < src_len; pos++) {
+		if (src[pos] != '{')
+			continue;
+
+		/* {name[:type][|alt]} */
+		tag_start = pos;
+		name_end = pos = scan_field(src, pos + 1, src_len);
+		type_start = type_end = alt_start = alt_end = -1;
+		if (pos + 1 < src_len && src[pos] == ':' && !is_tag_delim(src[pos + 1])) {
+			type_start = pos + 1;
+			type_end = pos = scan_field(src, type_start, src_len);
+		}
+		if (pos + 1 < src_len && src[pos] == '|' && !is_tag_delim(src[pos + 1])) {
+			alt_start = pos + 1;
+			alt_end = pos = scan_field(src, alt_start, src_len);
+		}
+		if (name_end == tag_start + 1 || pos >= src_len || src[pos] != '}') {
+			tag = PyUnicode_Substring(arg, tag_start, pos < src_len && src[pos] == '}' ? pos + 1 : pos);
+			if (tag) {
+				PyErr_Format(PyExc_ValueError, "invalid tag syntax: <%U>", tag);
+				Py_DECREF(tag);
+			}
+			goto failed;
+		}
+
+		if (!add_item(items, arg, sql_start, tag_start, name_end,
+			      type_start, type_end, alt_start, alt_end))
+			goto failed;
+		sql_start = pos + 1;
+	}
+
+	tail = PyUnicode_Substring(arg, sql_start, src_len);
+	if (!tail)
+		goto failed;
+	res = PyTuple_Pack(2, items, tail);
+failed:
+	Py_XDECREF(items);
+	Py_XDECREF(tail);
+	PyMem_Free(src);
+	return res;
+}
+
+/*
+ * Module initialization
+ */
+
+static PyMethodDef methods[] = {
+	{ "scan_template", scan_template, METH_O, "Split QueryBuilder template into sql fragments and placeholders.\n" },
+	{ NULL }
+};
+
+static PyModuleDef_Slot slots[] = {{0, NULL}};
+
+static struct PyModuleDef module = {
+	PyModuleDef_HEAD_INIT,
+	.m_name = "_cquerybuilder",
+	.m_doc = "QueryBuilder template scanner",
+	.m_size = 0,
+	.m_methods = methods,
+	.m_slots = slots
+};
+
+PyMODINIT_FUNC PyInit__cquerybuilder(void)
+{
+	return PyModuleDef_Init(&module);
+}
@@ -6,6 +6,7 @@
 #include <Python.h>
 
 #include <stdbool.h>
+#include <string.h>
 
 #ifdef _MSC_VER
 #define inline __inline
@@ -721,6 +722,163 @@ failed:
 	return NULL;
 }
 
+/*
+ * Postgres array parsing.
+ */
+
+static const char doc_parse_pgarray[] =
+"Parse Postgres array and return list of items inside it.\n\n"
+"C implementation.";
+
+/* position in characters, for error messages */
+static Py_ssize_t utf8_chars(const unsigned char *src, Py_ssize_t len)
+{
+	Py_ssize_t i, n = 0;
+	for (i = 0; i < len; i++) {
+		if ((src[i] & 0xC0) != 0x80)
+			n++;
+	}
+	return n;
+}
+
+static void array_incomplete(const unsigned char *src, const unsigned char *pos, Py_ssize_t src_len)
+{
+	PyErr_Format(PyExc_ValueError, "bad array format: failed to parse completely (pos=%zd len=%zd)",
+		     utf8_chars(src, pos - src), utf8_chars(src, src_len));
+}
+
+static void array_unexpected(const unsigned char *pos, const unsigned char *src_end)
+{
+	Py_ssize_t clen = 1;
+	PyObject *c;
+
+	while (pos + clen < src_end && (pos[clen] & 0xC0) == 0x80)
+		clen++;
+	c = PyUnicode_DecodeUTF8((const char *)pos, clen, "replace");
+	if (c) {
+		PyErr_Format(PyExc_ValueError, "bad array format: expected ,} got %R", c);
+		Py_CLEAR(c);
+	}
+}
+
+static PyObject *array_item(unsigned char *src, Py_ssize_t len, bool has_esc)
+{
+	if (has_esc)
+		return unescape_body(src, len);
+	return PyUnicode_DecodeUTF8((const char *)src, len, NULL);
+}
+
+static PyObject *parse_pgarray_body(unsigned char *src, Py_ssize_t src_len)
+{
+	unsigned char *pos, *p, *start, *end, *src_end = src + src_len;
+	PyObject *res, *item;
+	bool has_esc;
+
+	if (src_len < 1 || (src[0] != '{' && src[0] != '[') || src[src_len - 1] != '}') {
+		PyErr_Format(PyExc_ValueError, "bad array format: must be surrounded with {}");
+		return NULL;
+	}
+
+	/* final '}' */
+	end = src_end - 1;
+
+	/* skip optional dimensions descriptor "[a,b]={...}" */
+	pos = src + 1;
+	if (src[0] == '[') {
+		pos = memchr(src, '{', src_len);
+		if (!pos) {
+			PyErr_Format(PyExc_ValueError, "bad array format 2: must be surrounded with {}");
+			return NULL;
+		}
+		pos++;
+	}
+
+	res = PyList_New(0);
+	if (!res || pos == end)
+		return res;
+
+	while (1) {
+		has_esc = false;
+		if (*pos == '"') {
+			/* quoted element, backslash escapes next char */
+			start = pos + 1;
+			for (p = start; p < src_end && *p != '"'; p++) {
+				if (*p == '\\') {
+					has_esc = true;
+					p++;
+				}
+			}
+			if (p >= src_end) {
+				array_incomplete(src, pos, src_len);
+				goto failed;
+			}
+			item = array_item(start, p - start, has_esc);
+			p++;
+		} else {
+			/* unquoted element, up to next separator */
+			start = pos;
+			for (p = start; p < end && *p != ',' && *p != '"' && *p != '}'; p++) {
+				if (*p == '\\')
+					has_esc = true;
+			}
+			if (p == start) {
+				array_incomplete(src, pos, src_len);
+				goto failed;
+			}
+			if (p - start == 4 && (start[0] | 0x20) == 'n' && (start[1] | 0x20) == 'u'
+			    && (start[2] | 0x20) == 'l' && (start[3] | 0x20) == 'l') {
+				Py_INCREF(Py_None);
+				item = Py_None;
+			} else {
+				item = array_item(start, p - start, has_esc);
+			}
+		}
+		if (!item)
+			goto failed;
+		if (PyList_Append(res, item) < 0) {
+			Py_CLEAR(item);
+			goto failed;
+		}
+		Py_CLEAR(item);
+
+		pos = p + 1;
+		if (*p == '}')
+			break;
+		if (*p != ',') {
+			array_unexpected(p, src_end);
+			goto failed;
+		}
+	}
+	if (pos < end) {
+		array_incomplete(src, pos, src_len);
+		goto failed;
+	}
+	return res;
+failed:
+	Py_CLEAR(res);
+	return NULL;
+}
+
+static PyObject *parse_pgarray(PyObject *self, PyObject *args)
+{
+	unsigned char *src = NULL;
+	Py_ssize_t src_len;
+	PyObject *arg, *res, *strtmp = NULL;
+
+	if (!PyArg_ParseTuple(args, "O", &arg))
+		return NULL;
+	if (arg == Py_None) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	src_len = get_buffer(arg, &src, &strtmp);
+	if (src_len < 0)
+		return NULL;
+	res = parse_pgarray_body(src, src_len);
+	Py_CLEAR(strtmp);
+	return res;
+}
+
 /*
  * Module initialization
  */
@@ -733,6 +891,7 @@ static PyMethodDef methods[] = {
 	{ "db_urlencode", db_urlencode, METH_VARARGS, doc_db_urlencode },
 	{ "db_urldecode", db_urldecode, METH_VARARGS, doc_db_urldecode },
 	{ "unquote_literal", unquote_literal, METH_VARARGS, doc_unquote_literal },
+	{ "parse_pgarray", parse_pgarray, METH_VARARGS, doc_parse_pgarray },
 	{ NULL }
 };
 
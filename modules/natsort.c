@@ -0,0 +1,228 @@
+/*
+ * Natural sort key for Python.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stdint.h>
+#include <stdbool.h>
+#include <string.h>
+
+/*
+ * UCS4 output buffer.
+ */
+
+struct UBuf {
+	Py_UCS4 *ptr;
+	Py_ssize_t pos;
+	Py_ssize_t alloc;
+};
+
+static bool ubuf_init(struct UBuf *buf, Py_ssize_t init_size)
+{
+	if (init_size < 64)
+		init_size = 64;
+	buf->ptr = PyMem_Malloc(init_size * sizeof(Py_UCS4));
+	buf->pos = 0;
+	buf->alloc = init_size;
+	if (!buf->ptr) {
+		PyErr_NoMemory();
+		return false;
+	}
+	return true;
+}
+
+static bool ubuf_reserve(struct UBuf *buf, Py_ssize_t need_room)
+{
+	Py_ssize_t alloc = buf->alloc;
+	Py_ssize_t need_size = buf->pos + need_room;
+	Py_UCS4 *ptr;
+
+	if (need_size <= alloc)
+		return true;
+
+	if (alloc <= need_size / 2)
+		alloc = need_size;
+	else
+		alloc = alloc * 2;
+
+	ptr = PyMem_Realloc(buf->ptr, alloc * sizeof(Py_UCS4));
+	if (!ptr) {
+		PyErr_NoMemory();
+		return false;
+	}
+	buf->ptr = ptr;
+	buf->alloc = alloc;
+	return true;
+}
+
+static void ubuf_free(struct UBuf *buf)
+{
+	PyMem_Free(buf->ptr);
+	buf->ptr = NULL;
+	buf->pos = buf->alloc = 0;
+}
+
+/* room for marker char and decimal number */
+#define MAG_ROOM 24
+
+/* write decimal number, return number of digits */
+static Py_ssize_t write_num(Py_UCS4 *dst, uint64_t val)
+{
+	char tmp[MAG_ROOM];
+	Py_ssize_t n = 0, i;
+
+	do {
+		tmp[n++] = '0' + (val % 10);
+		val /= 10;
+	} while (val > 0);
+	for (i = 0; i < n; i++)
+		dst[i] = tmp[n - i - 1];
+	return n;
+}
+
+static Py_ssize_t count_digits(uint64_t val)
+{
+	Py_ssize_t n = 1;
+	while (val >= 10) {
+		val /= 10;
+		n++;
+	}
+	return n;
+}
+
+static inline bool is_digit(Py_UCS4 c)
+{
+	return c >= '0' && c <= '9';
+}
+
+/*
+ * Same rules as natsort_key_py():
+ *
+ * 1) strings < "0", stay as-is, followed by "\1"
+ * 2) numbers starting with 0, fragment starts with "A".."Z"
+ * 3) numbers starting with 1..9, fragment starts with "a".."z"
+ * 4) strings > "9", "|" + fragment + "\1"
+ */
+
+static bool build_key(struct UBuf *dst, const Py_UCS4 *src, Py_ssize_t src_len)
+{
+	const Py_UCS4 *pos = src, *end = src + src_len, *frag;
+	Py_ssize_t flen, nzeros, mlen;
+	uint64_t pow10;
+	Py_UCS4 mag[MAG_ROOM];
+	bool last_text = false;
+
+	while (pos < end) {
+		frag = pos;
+		if (is_digit(*pos)) {
+			while (pos < end && is_digit(*pos))
+				pos++;
+			flen = pos - frag;
+
+			if (*frag == '0') {
+				for (nzeros = 0; nzeros < flen && frag[nzeros] == '0'; nzeros++) {}
+				pow10 = 1;
+				for (mlen = count_digits(nzeros); mlen > 0; mlen--)
+					pow10 *= 10;
+				mlen = write_num(mag, pow10 - (uint64_t)nzeros);
+				if (!ubuf_reserve(dst, 1 + mlen + flen))
+					return false;
+				dst->ptr[dst->pos++] = 0x5B - mlen;
+			} else {
+				mlen = write_num(mag, (uint64_t)flen);
+				if (!ubuf_reserve(dst, 1 + mlen + flen))
+					return false;
+				dst->ptr[dst->pos++] = 0x60 + mlen;
+			}
+			memcpy(dst->ptr + dst->pos, mag, mlen * sizeof(Py_UCS4));
+			dst->pos += mlen;
+			memcpy(dst->ptr + dst->pos, frag, flen * sizeof(Py_UCS4));
+			dst->pos += flen;
+			last_text = false;
+		} else {
+			while (pos < end && !is_digit(*pos))
+				pos++;
+			flen = pos - frag;
+
+			if (!ubuf_reserve(dst, flen + 2))
+				return false;
+			if (*frag >= ':')
+				dst->ptr[dst->pos++] = '|';
+			memcpy(dst->ptr + dst->pos, frag, flen * sizeof(Py_UCS4));
+			dst->pos += flen;
+			dst->ptr[dst->pos++] = 1;
+			last_text = true;
+		}
+	}
+	if (!last_text) {
+		if (!ubuf_reserve(dst, 1))
+			return false;
+		dst->ptr[dst->pos++] = 1;
+	}
+	return true;
+}
+
+static PyObject *natsort_key(PyObject *self, PyObject *arg)
+{
+	static const union { uint32_t i; char c[4]; } endian = { 1 };
+	int byteorder = endian.c[0] ? -1 : 1;
+	struct UBuf buf;
+	Py_UCS4 *src, *p;
+	Py_ssize_t src_len;
+	PyObject *res = NULL;
+
+	if (!PyUnicode_Check(arg)) {
+		PyErr_Format(PyExc_TypeError, "natsort_key() argument must be str");
+		return NULL;
+	}
+	src_len = PyUnicode_GetLength(arg);
+	if (src_len < 0)
+		return NULL;
+	src = PyUnicode_AsUCS4Copy(arg);
+	if (!src)
+		return NULL;
+
+	/* '~' sorts before everything, including end-of-string */
+	for (p = src; p < src + src_len; p++) {
+		if (*p == '~')
+			*p = 0;
+	}
+
+	if (ubuf_init(&buf, src_len + src_len / 2 + 8)) {
+		if (build_key(&buf, src, src_len)) {
+			res = PyUnicode_DecodeUTF32((const char *)buf.ptr,
+						    buf.pos * sizeof(Py_UCS4),
+						    "surrogatepass", &byteorder);
+		}
+		ubuf_free(&buf);
+	}
+	PyMem_Free(src);
+	return res;
+}
+
+/*
+ * Module initialization
+ */
+
+static PyMethodDef methods[] = {
+	{ "natsort_key", natsort_key, METH_O, "Returns string that sorts according to natsort rules.\n" },
+	{ NULL }
+};
+
+static PyModuleDef_Slot slots[] = {{0, NULL}};
+
+static struct PyModuleDef module = {
+	PyModuleDef_HEAD_INIT,
+	.m_name = "_cnatsort",
+	.m_doc = "Natural sort key",
+	.m_size = 0,
+	.m_methods = methods,
+	.m_slots = slots
+};
+
+PyMODINIT_FUNC PyInit__cnatsort(void)
+{
+	return PyModuleDef_Init(&module);
+}
@@ -21,11 +21,17 @@ API_VER = ('Py_LIMITED_API', '0x03070000')
 
 setup(
     cmdclass = cmdclass,
+    # compile extensions in parallel, CC="ccache cc" is honored as usual
+    options = {"build_ext": {"parallel": True}},
     ext_modules = [
         Extension("skytools._cquoting", ["modules/cquoting.c"],
                   define_macros=[API_VER], py_limited_api=True),
         Extension("skytools._chashtext", ["modules/hashtext.c"],
                   define_macros=[API_VER], py_limited_api=True),
+        Extension("skytools._cnatsort", ["modules/natsort.c"],
+                  define_macros=[API_VER], py_limited_api=True),
+        Extension("skytools._cquerybuilder", ["modules/cquerybuilder.c"],
+                  define_macros=[API_VER], py_limited_api=True),
     ]
 )
 
@@ -0,0 +1,2 @@
+
+def natsort_key(s: str) -> str: ...
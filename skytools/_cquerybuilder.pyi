@@ -0,0 +1,3 @@
+from typing import List, Optional, Tuple
+
+def scan_template(expr: str) -> Tuple[List[Tuple[str, str, Optional[str], Optional[str]]], str]: ...
@@ -1,5 +1,5 @@
 
-from typing import Any, Optional, Mapping, Dict
+from typing import Any, Optional, Mapping, Dict, List
 
 def quote_literal(value: Any) -> str: ...
 def quote_copy(value: Any) -> str: ...
@@ -8,4 +8,4 @@ def db_urlencode(dict_val: Mapping[str, Any]) -> str: ...
 def db_urldecode(qs: str) -> Dict[str, Optional[str]]: ...
 def unescape(val: str) -> str: ...
 def unquote_literal(val: str, stdstr: bool = False) -> Optional[str]: ...
-
+def parse_pgarray(array: Optional[str]) -> Optional[List[Optional[str]]]: ...
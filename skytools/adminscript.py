@@ -3,7 +3,7 @@
 
 import inspect
 import sys
-from typing import Any, Callable, Mapping, Optional, Sequence
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple
 
 import skytools
 
@@ -11,6 +11,8 @@ from .basetypes import Connection, DictRow, ExecuteParams
 
 __all__ = ['AdminScript']
 
+_POSITIONAL = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+
 
 class AdminScript(skytools.DBScript):
     """Contains common admin script tools.
@@ -21,6 +23,8 @@ class AdminScript(skytools.DBScript):
     """
     commands_without_pidfile: Sequence[str] = ()
 
+    _cmd_sig_cache: Dict[Tuple[type, str], Tuple[Sequence[str], bool]] = {}
+
     def __init__(self, service_name: str, args: Sequence[str]) -> None:
         """AdminScript init."""
         super().__init__(service_name, args)
@@ -52,15 +56,12 @@ class AdminScript(skytools.DBScript):
         fn = getattr(self, fname)
 
         # check if correct number of arguments
-        (
-            args, varargs, ___varkw, ___defaults,
-            ___kwonlyargs, __kwonlydefaults, ___annotations,
-        ) = inspect.getfullargspec(fn)
-        n_args = len(args) - 1  # drop 'self'
-        if varargs is None and n_args != len(cmdargs):
+        argnames, has_varargs = self._get_cmd_signature(fname, fn)
+        n_args = len(argnames)
+        if not has_varargs and n_args != len(cmdargs):
             helpstr = ""
             if n_args:
-                helpstr = ": " + " ".join(args[1:])
+                helpstr = ": " + " ".join(argnames)
             self.log.error("command '%s' got %d args, but expects %d%s",
                            cmd, len(cmdargs), n_args, helpstr)
             sys.exit(1)
@@ -70,16 +71,29 @@ class AdminScript(skytools.DBScript):
 
         return None
 
+    @classmethod
+    def _get_cmd_signature(cls, fname: str, fn: Callable[..., Any]) -> Tuple[Sequence[str], bool]:
+        """Return positional arg names and varargs flag for bound command method."""
+        key = (cls, fname)
+        sig = cls._cmd_sig_cache.get(key)
+        if sig is None:
+            params = inspect.signature(fn).parameters.values()
+            argnames = [p.name for p in params if p.kind in _POSITIONAL]
+            has_varargs = any(p.kind == p.VAR_POSITIONAL for p in params)
+            sig = (argnames, has_varargs)
+            cls._cmd_sig_cache[key] = sig
+        return sig
+
     def fetch_list(self, db: Connection, sql: str, args: ExecuteParams, keycol: Optional[str] = None) -> Sequence[Any]:
         """Fetch a resultset from db, optionally turning it into value list."""
         curs = db.cursor()
         curs.execute(sql, args)
-        rows = curs.fetchall()
-        db.commit()
         if not keycol:
-            res = rows
+            res = curs.fetchall()
         else:
-            res = [r[keycol] for r in rows]
+            # iterate to avoid keeping full row objects around
+            res = [r[keycol] for r in curs]
+        db.commit()
         return res
 
     def display_table(self, db: Connection, desc: str, sql: str, args: ExecuteParams = (),
@@ -99,12 +113,18 @@ class AdminScript(skytools.DBScript):
         if not fields:
             fields = [f[0] for f in curs.description]
 
-        widths = [15] * len(fields)
+        # render cells once, reuse for both width calculation and output
+        cells = []
         for row in rows:
-            for i, k in enumerate(fields):
-                rlen = len(str(row[k])) if row[k] else 0
-                widths[i] = widths[i] > rlen and widths[i] or rlen
-        widths = [w + 2 for w in widths]
+            vals = []
+            for field in fields:
+                val = row[field]
+                if field in fieldfmt:
+                    val = fieldfmt[field](val)
+                vals.append(str(val))
+            cells.append(vals)
+
+        widths = [max(15, max(len(vals[i]) for vals in cells)) + 2 for i in range(len(fields))]
 
         fmt = '%%-%ds' * (len(widths) - 1) + '%%s'
         fmt = fmt % tuple(widths[:-1])
@@ -113,13 +133,7 @@ class AdminScript(skytools.DBScript):
         print(fmt % tuple(fields))
         print(fmt % tuple('-' * (w - 2) for w in widths))
         #print(fmt % tuple(['-'*15] * len(fields)))
-        for row in rows:
-            vals = []
-            for field in fields:
-                val = row[field]
-                if field in fieldfmt:
-                    val = fieldfmt[field](val)
-                vals.append(val)
+        for vals in cells:
             print(fmt % tuple(vals))
         print('\n')
         return 1
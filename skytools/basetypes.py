@@ -49,6 +49,7 @@ class Cursor(Protocol):
     def execute(self, sql: str, params: Optional[ExecuteParams] = None) -> None: raise NotImplementedError
     def fetchall(self) -> Sequence[DictRow]: raise NotImplementedError
     def fetchone(self) -> DictRow: raise NotImplementedError
+    def __iter__(self) -> Iterator[DictRow]: raise NotImplementedError
     def __enter__(self) -> "Cursor": raise NotImplementedError
     def __exit__(self, typ: Optional[Type[BaseException]], exc: Optional[BaseException],
                  tb: Optional[types.TracebackType]) -> None:
@@ -97,18 +98,16 @@ class HasFileno(Protocol):
 FileDescriptor = int
 FileDescriptorLike = Union[int, HasFileno]
 
-try:
-    from typing_extensions import Buffer  # type: ignore
-except ImportError:
-    if typing.TYPE_CHECKING:
-        from _typeshed import Buffer  # type: ignore
-    else:
-        try:
-            from collections.abc import Buffer  # type: ignore
-        except ImportError:
-            class Buffer(abc.ABC):
-                pass
-            Buffer.register(memoryview)
-            Buffer.register(bytearray)
-            Buffer.register(bytes)
-
+# typing_extensions is slow to import and Buffer is used
+# only in annotations, so load it only for type checkers.
+if typing.TYPE_CHECKING:
+    from typing_extensions import Buffer
+else:
+    try:
+        from collections.abc import Buffer
+    except ImportError:
+        class Buffer(abc.ABC):
+            pass
+        Buffer.register(memoryview)
+        Buffer.register(bytearray)
+        Buffer.register(bytes)
@@ -1,6 +1,8 @@
 """Nicer config class.
 """
 
+import copy
+import functools
 import os
 import os.path
 import re
@@ -11,7 +13,10 @@ from configparser import (
     ExtendedInterpolation, Interpolation, InterpolationDepthError,
     InterpolationError, NoOptionError, NoSectionError, RawConfigParser,
 )
-from typing import Dict, List, Mapping, MutableMapping, Optional, Sequence, Set, Tuple
+from typing import (
+    Any, Callable, Dict, List, Mapping, MutableMapping,
+    Optional, Sequence, Set, Tuple, TypeVar,
+)
 
 import skytools
 
@@ -21,6 +26,14 @@ __all__ = (
     'InterpolationError', 'NoOptionError', 'NoSectionError',
 )
 
+T = TypeVar("T")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_hostname() -> str:
+    """Host name does not change during process lifetime."""
+    return socket.gethostname()
+
 
 def read_versioned_config(filenames: Sequence[str], main_section: str) -> ConfigParser:
     """Pick syntax based on "config_format" value.
@@ -53,6 +66,7 @@ class Config:
     override: Mapping[str, str]     # override values in config file
     defs: Mapping[str, str]         # defaults visible in all sections
     cf: ConfigParser                # actual ConfigParser instance
+    _parsed: Dict[Tuple[str, str], Any]     # converted values, reset on reload
 
     def __init__(self, main_section: str,
                  filename: Optional[str],
@@ -62,6 +76,25 @@ class Config:
                  ignore_defs: bool = False) -> None:
         """Initialize Config and read from file.
         """
+        self._setup(main_section, filename, user_defs, override, ignore_defs)
+
+        if filename is None:
+            self.cf = ConfigParser()
+            self.cf.add_section(main_section)
+        elif not os.path.isfile(filename):
+            raise ConfigError('Config file not found: ' + filename)
+        else:
+            self.cf = read_versioned_config([filename], main_section)
+
+        self.reload()
+
+    def _setup(self, main_section: str,
+               filename: Optional[str],
+               user_defs: Optional[Mapping[str, str]],
+               override: Optional[Mapping[str, str]],
+               ignore_defs: bool) -> None:
+        """Set up attributes, except ConfigParser.
+        """
         # use config file name as default job_name
         if filename:
             job_name = os.path.splitext(os.path.basename(filename))[0]
@@ -75,7 +108,7 @@ class Config:
             self.defs = {
                 'job_name': job_name,
                 'service_name': main_section,
-                'host_name': socket.gethostname(),
+                'host_name': _get_hostname(),
             }
             if filename:
                 self.defs['config_dir'] = os.path.dirname(filename)
@@ -86,21 +119,16 @@ class Config:
         self.main_section = main_section
         self.filename = filename
         self.override = override or {}
-
-        if filename is None:
-            self.cf = ConfigParser()
-            self.cf.add_section(main_section)
-        elif not os.path.isfile(filename):
-            raise ConfigError('Config file not found: ' + filename)
-        else:
-            self.cf = read_versioned_config([filename], main_section)
-
-        self.reload()
+        self._parsed = {}
 
     def reload(self) -> None:
         """Re-reads config file."""
         if self.filename:
             self.cf.read(self.filename)
+        self._apply_defaults()
+
+    def _apply_defaults(self) -> None:
+        """Apply defaults and overrides to main section."""
         if not self.cf.has_section(self.main_section):
             raise NoSectionError(self.main_section)
 
@@ -114,61 +142,79 @@ class Config:
             for k, v in self.override.items():
                 self.cf.set(self.main_section, k, v)
 
+        self._parsed.clear()
+
+    def _get_raw(self, key: str) -> Optional[str]:
+        """Single lookup for interpolated value, None if not set.
+
+        Only missing key itself gives None, errors from
+        interpolation are passed through.
+        """
+        return self.cf.get(self.main_section, key, fallback=None)
+
+    def _get_parsed(self, kind: str, key: str, conv: Callable[[str], T]) -> Optional[T]:
+        """Converted value, cached until reload.  None if not set.
+        """
+        ckey = (kind, key)
+        if ckey in self._parsed:
+            return self._parsed[ckey]
+        val = self._get_raw(key)
+        if val is None:
+            return None
+        res = conv(val)
+        self._parsed[ckey] = res
+        return res
+
     def get(self, key: str, default: Optional[str] = None) -> str:
         """Reads string value, if not set then default."""
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_raw(key)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
             return default
 
-        return str(self.cf.get(self.main_section, key))
+        return str(val)
 
     def getint(self, key: str, default: Optional[int] = None) -> int:
         """Reads int value, if not set then default."""
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_parsed("int", key, int)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
             return default
-
-        return self.cf.getint(self.main_section, key)
+        return val
 
     def getboolean(self, key: str, default: Optional[bool] = None) -> bool:
         """Reads boolean value, if not set then default."""
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_parsed("bool", key, self._conv_boolean)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
             return default
-
-        return self.cf.getboolean(self.main_section, key)
+        return val
 
     def getfloat(self, key: str, default: Optional[float] = None) -> float:
         """Reads float value, if not set then default."""
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_parsed("float", key, float)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
             return default
-
-        return self.cf.getfloat(self.main_section, key)
+        return val
 
     def getlist(self, key: str, default: Optional[List[str]] = None) -> List[str]:
         """Reads comma-separated list from key."""
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_parsed("list", key, self._conv_list)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
             return default
-
-        s = self.get(key).strip()
-        res: List[str] = []
-        if not s:
-            return res
-        for v in s.split(","):
-            res.append(v.strip())
-        return res
+        return list(val)
 
     def getdict(self, key: str, default: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """Reads key-value dict from parameter.
@@ -177,25 +223,12 @@ class Config:
         key itself is taken as value.
         """
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_parsed("dict", key, self._conv_dict)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
             return default
-
-        s = self.get(key).strip()
-        res: Dict[str, str] = {}
-        if not s:
-            return res
-        for kv in s.split(","):
-            tmp = kv.split(':', 1)
-            if len(tmp) > 1:
-                k = tmp[0].strip()
-                v = tmp[1].strip()
-            else:
-                k = kv.strip()
-                v = k
-            res[k] = v
-        return res
+        return dict(val)
 
     def getfile(self, key: str, default: Optional[str] = None) -> str:
         """Reads filename from config.
@@ -219,14 +252,12 @@ class Config:
         Examples: 1, 2 B, 3K, 4 MB
         """
 
-        if not self.cf.has_option(self.main_section, key):
+        val = self._get_parsed("bytes", key, skytools.hsize_to_bytes)
+        if val is None:
             if default is None:
                 raise NoOptionError(key, self.main_section)
-            s = default
-        else:
-            s = self.cf.get(self.main_section, key)
-
-        return skytools.hsize_to_bytes(s)
+            return skytools.hsize_to_bytes(default)
+        return val
 
     def get_wildcard(self, key: str, values: Sequence[str] = (), default: Optional[str] = None) -> str:
         """Reads a wildcard property from conf and returns its string value, if not set then default."""
@@ -237,11 +268,12 @@ class Config:
         for wild in values:
             key = key.replace('*', wild, 1)
             keys.append(key)
-        keys.reverse()
 
-        for k in keys:
-            if self.cf.has_option(self.main_section, k):
-                return self.cf.get(self.main_section, k)
+        # most specific key first
+        for k in reversed(keys):
+            val = self._get_raw(k)
+            if val is not None:
+                return val
 
         if default is None:
             raise NoOptionError(orig_key, self.main_section)
@@ -256,8 +288,18 @@ class Config:
         return self.cf.has_section(section)
 
     def clone(self, main_section: str) -> "Config":
-        """Return new Config() instance with new main section on same config file."""
-        return Config(main_section, self.filename)
+        """Return new Config() instance with new main section on same config file.
+
+        Already parsed file is copied, instead of reading it again.
+        """
+        if not self.filename or main_section == self.main_section:
+            # nothing to reuse, or main section has local defaults applied
+            return Config(main_section, self.filename)
+        res = Config.__new__(Config)
+        res._setup(main_section, self.filename, None, None, False)
+        res.cf = copy.deepcopy(self.cf)
+        res._apply_defaults()
+        return res
 
     def options(self) -> Sequence[str]:
         """Return list of options in main section."""
@@ -271,6 +313,36 @@ class Config:
         """Returns list of (name, value) for each option in main section."""
         return self.cf.items(self.main_section)
 
+    def _conv_boolean(self, val: str) -> bool:
+        lval = val.lower()
+        if lval not in self.cf.BOOLEAN_STATES:
+            raise ValueError('Not a boolean: %s' % val)
+        return self.cf.BOOLEAN_STATES[lval]
+
+    @staticmethod
+    def _conv_list(val: str) -> List[str]:
+        s = val.strip()
+        if not s:
+            return []
+        return [v.strip() for v in s.split(",")]
+
+    @staticmethod
+    def _conv_dict(val: str) -> Dict[str, str]:
+        s = val.strip()
+        res: Dict[str, str] = {}
+        if not s:
+            return res
+        for kv in s.split(","):
+            tmp = kv.split(':', 1)
+            if len(tmp) > 1:
+                k = tmp[0].strip()
+                v = tmp[1].strip()
+            else:
+                k = kv.strip()
+                v = k
+            res[k] = v
+        return res
+
     # define some aliases (short-cuts / backward compatibility cruft)
     getbool = getboolean
 
@@ -288,11 +360,15 @@ class ExtendedInterpolationCompat(Interpolation):
     _bad_rc = re.compile('[%$]')
 
     def before_get(self, parser: ParserState, section: str, option: str, value: str, defaults: ParserSection) -> str:
+        if '$' not in value and '%' not in value:
+            return value
         dst: List[str] = []
         self._interpolate_ext(dst, parser, section, option, value, defaults, set())
         return ''.join(dst)
 
     def before_set(self, parser: ParserState, section: str, option: str, value: str) -> str:
+        if '$' not in value and '%' not in value:
+            return value
         sub = self._var_rc.sub('', value)
         if self._bad_rc.search(sub):
             raise ValueError("invalid interpolation syntax in %r" % value)
@@ -341,7 +417,11 @@ class ExtendedInterpolationCompat(Interpolation):
                 newpart = parser.get(ksect, key, raw=True, vars=use_vars)
                 if newpart is None:
                     raise InterpolationError(ksect, key, 'Key referenced is None')
-                self._interpolate_ext(dst, parser, ksect, key, newpart, defaults, loop_detect)
+                if '$' not in newpart and '%' not in newpart:
+                    # plain value, no need to recurse
+                    dst.append(newpart)
+                else:
+                    self._interpolate_ext(dst, parser, ksect, key, newpart, defaults, loop_detect)
 
         loop_detect.remove(xloop)
 
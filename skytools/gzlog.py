@@ -4,30 +4,36 @@ The point is - if several gzip streams are concatenated,
 they are read back as one whole stream.
 """
 
-import gzip
-import io
+import os
+import zlib
 
 __all__ = ('gzip_append',)
 
+_O_BINARY = getattr(os, "O_BINARY", 0)
+
 
 def gzip_append(filename: str, data: bytes, level: int = 6) -> None:
     """Append a block of data to file with safety checks."""
 
-    # compress data
-    buf = io.BytesIO()
-    with gzip.GzipFile(fileobj=buf, compresslevel=level, mode="w") as g:
-        g.write(data)
-    zdata = buf.getvalue()
-
-    # append, safely
-    with open(filename, "ab+", 0) as f:
-        f.seek(0, 2)
-        pos = f.tell()
-        try:
-            f.write(zdata)
-        except Exception as ex:
-            # rollback on error
-            f.seek(pos, 0)
-            f.truncate()
-            raise ex
-
+    # compress data, wbits=16+ gives gzip header and trailer
+    zobj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    zdata = zobj.compress(data) + zobj.flush()
+
+    # append, safely - with O_APPEND a single write() goes to the
+    # end of file as a whole, rollback is needed only if it was partial
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND | _O_BINARY, 0o666)
+    try:
+        view = memoryview(zdata)
+        written = os.write(fd, view)
+        if written < len(view):
+            pos = os.lseek(fd, 0, os.SEEK_CUR) - written
+            try:
+                view = view[written:]
+                while view:
+                    view = view[os.write(fd, view):]
+            except Exception as ex:
+                # rollback on error
+                os.ftruncate(fd, pos)
+                raise ex
+    finally:
+        os.close(fd)
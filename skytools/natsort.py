@@ -17,6 +17,7 @@ Extra rules for version numbers:
 
 """
 
+import functools
 import re
 from typing import List, Sequence
 
@@ -26,9 +27,10 @@ __all__ = (
 )
 
 _rc = re.compile(r'\d+|\D+', re.A)
+_findall = _rc.findall
 
 
-def natsort_key(s: str) -> str:
+def natsort_key_py(s: str) -> str:
     """Returns string that sorts according to natsort rules.
     """
     # generates four types of fragments:
@@ -38,22 +40,26 @@ def natsort_key(s: str) -> str:
     # 4) strings > "9", fragment starts with "|"
     if "~" in s:
         s = s.replace("~", "\0")
+    # local aliases, avoid global lookups in loop
+    _len = len
+    _str = str
+    _chr = chr
     key: List[str] = []
     key_append = key.append
-    for frag in _rc.findall(s):
+    for frag in _findall(s):
         if frag < "0":
             key_append(frag)
             key_append("\1")
         elif frag < "1":
-            nzeros = len(frag) - len(frag.lstrip('0'))
-            mag = str(nzeros)
-            mag = str(10**len(mag) - nzeros)
-            key_append(chr(0x5B - len(mag)))    # Z, Y, X, ...
+            nzeros = _len(frag) - _len(frag.lstrip('0'))
+            mag = _str(nzeros)
+            mag = _str(10**_len(mag) - nzeros)
+            key_append(_chr(0x5B - _len(mag)))  # Z, Y, X, ...
             key_append(mag)
             key_append(frag)
         elif frag < ":":
-            mag = str(len(frag))
-            key_append(chr(0x60 + len(mag)))    # a, b, c, ...
+            mag = _str(_len(frag))
+            key_append(_chr(0x60 + _len(mag)))  # a, b, c, ...
             key_append(mag)
             key_append(frag)
         else:
@@ -65,6 +71,13 @@ def natsort_key(s: str) -> str:
     return "".join(key)
 
 
+try:
+    from skytools._cnatsort import natsort_key
+except ImportError:
+    # cache helps repeated sorts, C version is faster without it
+    natsort_key = functools.lru_cache(maxsize=1 << 16)(natsort_key_py)
+
+
 def natsort(lst: List[str]) -> None:
     """Natural in-place sort, case-sensitive."""
     lst.sort(key=natsort_key)
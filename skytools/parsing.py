@@ -1,6 +1,7 @@
 """Various parsers for Postgres-specific data formats.
 """
 
+import functools
 import re
 from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
@@ -13,165 +14,164 @@ __all__ = (
     "parse_connect_string", "merge_connect_string",
 )
 
-_rc_listelem = re.compile(r'( [^,"}]+ | ["] ( [^"\\]+ | [\\]. )* ["] )', re.X)
 
-
-def parse_pgarray(array: Optional[str]) -> Optional[List[Optional[str]]]:
+def parse_pgarray_py(array: Optional[str]) -> Optional[List[Optional[str]]]:
     r"""Parse Postgres array and return list of items inside it.
+
+    Python implementation.
     """
     if array is None:
         return None
     if not array or array[0] not in ("{", "[") or array[-1] != '}':
         raise ValueError("bad array format: must be surrounded with {}")
-    res = []
+    res: List[Optional[str]] = []
     pos = 1
     # skip optional dimensions descriptor "[a,b]={...}"
     if array[0] == "[":
         pos = array.find('{') + 1
         if pos < 1:
             raise ValueError("bad array format 2: must be surrounded with {}")
+    end = len(array) - 1
+    if pos == end:
+        return res
+    unescape = skytools.unescape
+    append = res.append
     while True:
-        m = _rc_listelem.search(array, pos)
-        if not m:
-            break
-        pos2 = m.end()
-        item = array[pos:pos2]
-        if len(item) == 4 and item.upper() == "NULL":
-            val = None
+        if array[pos] == '"':
+            # quoted element, backslash escapes next char
+            start = pos + 1
+            pos2 = start
+            while True:
+                q = array.find('"', pos2)
+                if q < 0:
+                    raise ValueError("bad array format: failed to parse completely (pos=%d len=%d)" % (pos, len(array)))
+                bs = array.find('\\', pos2, q)
+                if bs < 0:
+                    break
+                pos2 = bs + 2
+            item = array[start:q]
+            append(unescape(item) if '\\' in item else item)
+            pos2 = q + 1
         else:
-            if item and item[0] == '"':
-                item = item[1:-1]
-            val = skytools.unescape(item)
-        res.append(val)
+            # unquoted element, up to next separator
+            pos2 = array.find(',', pos, end)
+            if pos2 < 0:
+                pos2 = end
+            item = array[pos:pos2]
+            if '"' in item or '}' in item:
+                q = item.find('"')
+                b = item.find('}')
+                pos2 = pos + (b if q < 0 or 0 <= b < q else q)
+                item = array[pos:pos2]
+            if not item:
+                raise ValueError("bad array format: failed to parse completely (pos=%d len=%d)" % (pos, len(array)))
+            if len(item) == 4 and item.upper() == "NULL":
+                append(None)
+            else:
+                append(unescape(item) if '\\' in item else item)
 
         pos = pos2 + 1
-        if array[pos2] == "}":
+        c = array[pos2]
+        if c == "}":
             break
-        elif array[pos2] != ",":
-            raise ValueError("bad array format: expected ,} got " + repr(array[pos2]))
+        elif c != ",":
+            raise ValueError("bad array format: expected ,} got " + repr(c))
     if pos < len(array) - 1:
         raise ValueError("bad array format: failed to parse completely (pos=%d len=%d)" % (pos, len(array)))
     return res
 
 
+try:
+    from skytools._cquoting import parse_pgarray
+except ImportError:
+    parse_pgarray = parse_pgarray_py
+
+
 #
 # parse logtriga partial sql
 #
 
-class _logtriga_parser:
-    """Parses logtriga/sqltriga partial SQL to values."""
-    pklist: List[str]
-    def tokenizer(self, sql: str) -> Iterator[str]:
-        """Token generator."""
-        for tup in sql_tokenizer(sql, ignore_whitespace=True):
-            yield tup[1]
-
-    def parse_insert(self, tk: Iterator[str], fields: List[str], values: List[str],
-                     key_fields: List[str], key_values: List[str]) -> None:
-        """Handler for inserts."""
-        # (col1, col2) values ('data', null)
-        if next(tk) != "(":
+# column names repeat from row to row
+_unquote_ident_cached = functools.lru_cache(maxsize=4096)(skytools.unquote_ident)
+
+
+def _parse_insert(tk: Iterator[str], fields: List[str], values: List[str],
+                  key_fields: List[str], key_values: List[str]) -> None:
+    """Handler for inserts."""
+    # (col1, col2) values ('data', null)
+    if next(tk) != "(":
+        raise ValueError("syntax error")
+    while True:
+        fields.append(next(tk))
+        t = next(tk)
+        if t == ")":
+            break
+        elif t != ",":
             raise ValueError("syntax error")
-        while True:
-            fields.append(next(tk))
-            t = next(tk)
-            if t == ")":
-                break
-            elif t != ",":
-                raise ValueError("syntax error")
-        if next(tk).lower() != "values":
-            raise ValueError("syntax error, expected VALUES")
-        if next(tk) != "(":
-            raise ValueError("syntax error, expected (")
-        while True:
-            values.append(next(tk))
-            t = next(tk)
-            if t == ")":
-                break
-            if t == ",":
-                continue
-            raise ValueError("expected , or ) got " + t)
+    if next(tk).lower() != "values":
+        raise ValueError("syntax error, expected VALUES")
+    if next(tk) != "(":
+        raise ValueError("syntax error, expected (")
+    while True:
+        values.append(next(tk))
         t = next(tk)
-        raise ValueError("expected EOF, got " + repr(t))
-
-    def parse_update(self, tk: Iterator[str], fields: List[str], values: List[str],
-                     key_fields: List[str], key_values: List[str]) -> None:
-        """Handler for updates."""
-        # col1 = 'data1', col2 = null where pk1 = 'pk1' and pk2 = 'pk2'
-        while True:
-            fields.append(next(tk))
-            if next(tk) != "=":
-                raise ValueError("syntax error")
-            values.append(next(tk))
-            t = next(tk)
-            if t == ",":
-                continue
-            elif t.lower() == "where":
-                break
-            else:
-                raise ValueError("syntax error, expected WHERE or , got " + repr(t))
-        while True:
-            fld = next(tk)
-            key_fields.append(fld)
-            self.pklist.append(fld)
-            if next(tk) != "=":
-                raise ValueError("syntax error")
-            key_values.append(next(tk))
-            t = next(tk)
-            if t.lower() != "and":
-                raise ValueError("syntax error, expected AND got " + repr(t))
-
-    def parse_delete(self, tk: Iterator[str], fields: List[str], values: List[str],
-                     key_fields: List[str], key_values: List[str]) -> None:
-        """Handler for deletes."""
-        # pk1 = 'pk1' and pk2 = 'pk2'
-        while True:
-            fld = next(tk)
-            key_fields.append(fld)
-            self.pklist.append(fld)
-            if next(tk) != "=":
-                raise ValueError("syntax error")
-            key_values.append(next(tk))
-            t = next(tk)
-            if t.lower() != "and":
-                raise ValueError("syntax error, expected AND, got " + repr(t))
-
-    def _create_dbdict(self, fields: List[str], values: List[str]) -> skytools.dbdict:
-        fields2 = [skytools.unquote_ident(f) for f in fields]
-        values2 = [skytools.unquote_literal(v) for v in values]
-        return skytools.dbdict(zip(fields2, values2))
-
-    def parse_sql(self, op: str, sql: str, pklist: Optional[Sequence[str]] = None, splitkeys: bool = False
-                  ) -> Union[skytools.dbdict, Tuple[skytools.dbdict, skytools.dbdict]]:
-        """Main entry point."""
-        if pklist is None:
-            self.pklist = []
+        if t == ")":
+            break
+        if t == ",":
+            continue
+        raise ValueError("expected , or ) got " + t)
+    t = next(tk)
+    raise ValueError("expected EOF, got " + repr(t))
+
+
+def _parse_update(tk: Iterator[str], fields: List[str], values: List[str],
+                  key_fields: List[str], key_values: List[str]) -> None:
+    """Handler for updates."""
+    # col1 = 'data1', col2 = null where pk1 = 'pk1' and pk2 = 'pk2'
+    while True:
+        fields.append(next(tk))
+        if next(tk) != "=":
+            raise ValueError("syntax error")
+        values.append(next(tk))
+        t = next(tk)
+        if t == ",":
+            continue
+        elif t.lower() == "where":
+            break
         else:
-            self.pklist = list(pklist)
-        tk = self.tokenizer(sql)
-        fields: List[str] = []
-        values: List[str] = []
-        key_fields: List[str] = []
-        key_values: List[str] = []
-        try:
-            if op == "I":
-                self.parse_insert(tk, fields, values, key_fields, key_values)
-            elif op == "U":
-                self.parse_update(tk, fields, values, key_fields, key_values)
-            elif op == "D":
-                self.parse_delete(tk, fields, values, key_fields, key_values)
+            raise ValueError("syntax error, expected WHERE or , got " + repr(t))
+    while True:
+        fld = next(tk)
+        key_fields.append(fld)
+        if next(tk) != "=":
+            raise ValueError("syntax error")
+        key_values.append(next(tk))
+        t = next(tk)
+        if t.lower() != "and":
+            raise ValueError("syntax error, expected AND got " + repr(t))
+
+
+def _parse_delete(tk: Iterator[str], fields: List[str], values: List[str],
+                  key_fields: List[str], key_values: List[str]) -> None:
+    """Handler for deletes."""
+    # pk1 = 'pk1' and pk2 = 'pk2'
+    while True:
+        fld = next(tk)
+        key_fields.append(fld)
+        if next(tk) != "=":
             raise ValueError("syntax error")
-        except StopIteration:
-            pass
-        # last sanity check
-        if (len(fields) + len(key_fields) == 0 or
-            len(fields) != len(values) or
-                len(key_fields) != len(key_values)):
-            raise ValueError("syntax error, fields do not match values")
-        if splitkeys:
-            return (self._create_dbdict(key_fields, key_values),
-                    self._create_dbdict(fields, values))
-        return self._create_dbdict(fields + key_fields, values + key_values)
+        key_values.append(next(tk))
+        t = next(tk)
+        if t.lower() != "and":
+            raise ValueError("syntax error, expected AND, got " + repr(t))
+
+
+def _create_dbdict(fields: List[str], values: List[str]) -> skytools.dbdict:
+    unquote_literal = skytools.unquote_literal
+    res = skytools.dbdict()
+    for f, v in zip(fields, values):
+        res[_unquote_ident_cached(f)] = None if v == "null" else unquote_literal(v)
+    return res
 
 
 def parse_logtriga_sql(
@@ -194,7 +194,30 @@ def parse_sqltriga_sql(
 
     Returns dict of col->data pairs.
     """
-    return _logtriga_parser().parse_sql(op, sql, pklist, splitkeys=splitkeys)
+    tk = iter([tup[1] for tup in sql_tokenizer(sql, ignore_whitespace=True)])
+    fields: List[str] = []
+    values: List[str] = []
+    key_fields: List[str] = []
+    key_values: List[str] = []
+    try:
+        if op == "I":
+            _parse_insert(tk, fields, values, key_fields, key_values)
+        elif op == "U":
+            _parse_update(tk, fields, values, key_fields, key_values)
+        elif op == "D":
+            _parse_delete(tk, fields, values, key_fields, key_values)
+        raise ValueError("syntax error")
+    except StopIteration:
+        pass
+    # last sanity check
+    if (len(fields) + len(key_fields) == 0 or
+        len(fields) != len(values) or
+            len(key_fields) != len(key_values)):
+        raise ValueError("syntax error, fields do not match values")
+    if splitkeys:
+        return (_create_dbdict(key_fields, key_values),
+                _create_dbdict(fields, values))
+    return _create_dbdict(fields + key_fields, values + key_values)
 
 
 def parse_tabbed_table(txt: str) -> List[Dict[str, str]]:
@@ -222,34 +245,49 @@ def parse_tabbed_table(txt: str) -> List[Dict[str, str]]:
     return data
 
 
-_extstr = r""" ['] (?: [^'\\]+ | \\. | [']['] )* ['] """
-_stdstr = r""" ['] (?: [^']+ | [']['] )* ['] """
-_name = r""" (?: [a-z_][a-z0-9_$]* | " (?: [^"]+ | "" )* " ) """
+# quoted parts use unrolled loops, nested quantifiers like (?: [^']+ | '' )*
+# backtrack exponentially on unterminated quotes
+_extstr = r""" ['] [^'\\]* (?: (?: \\. | [']['] ) [^'\\]* )* ['] """
+_stdstr = r""" ['] [^']* (?: [']['] [^']* )* ['] """
+_name = r""" (?: [a-z_][a-z0-9_$]* | " [^"]* (?: "" [^"]* )* " ) """
 
 _ident = r""" (?P<ident> %s ) """ % _name
 _fqident = r""" (?P<ident> %s (?: \. %s )* ) """ % (_name, _name)
 
+# branches are tried in order, most frequent first; ws before sym
+# (comments), str before ident (E''), pyold before sym (%)
+_ws = r""" (?P<ws>     (?: \s+ | [/][*] .*? [*][/] | [-][-][^\n]* )+ ) """
+
 _base_sql = r"""
-      (?P<dolq>   (?P<dname> [$] (?: [_a-z][_a-z0-9]*)? [$] )
-                  .*?
-                  (?P=dname) )
+      (?P<pyold>  [%][(] [a-z_][a-z0-9_]* [)] [s] )
+    | (?P<sym>    (?: [-+*~!@#^&|?/%<>=]+ | [,()\[\].:;] ) )
     | (?P<num>    [0-9][0-9.e]* )
     | (?P<numarg> [$] [0-9]+ )
-    | (?P<pyold>  [%][(] [a-z_][a-z0-9_]* [)] [s] )
     | (?P<pynew>  [{] [^{}]+ [}] )
-    | (?P<ws>     (?: \s+ | [/][*] .*? [*][/] | [-][-][^\n]* )+ )
-    | (?P<sym>    (?: [-+*~!@#^&|?/%<>=]+ | [,()\[\].:;] ) )
+    | (?P<dolq>   (?P<dname> [$] (?: [_a-z][_a-z0-9]*)? [$] )
+                  .*?
+                  (?P=dname) )
     | (?P<error>  . )"""
 
 _base_sql_fq = r"%s | %s" % (_fqident, _base_sql)
 _base_sql = r"%s | %s" % (_ident, _base_sql)
 
-_std_sql = r"""(?: (?P<str> [E] %s | %s ) | %s )""" % (_extstr, _stdstr, _base_sql)
-_std_sql_fq = r"""(?: (?P<str> [E] %s | %s ) | %s )""" % (_extstr, _stdstr, _base_sql_fq)
-_ext_sql = r"""(?: (?P<str> [E]? %s ) | %s )""" % (_extstr, _base_sql)
-_ext_sql_fq = r"""(?: (?P<str> [E]? %s ) | %s )""" % (_extstr, _base_sql_fq)
-_std_sql_rc = _ext_sql_rc = None
-_std_sql_fq_rc = _ext_sql_fq_rc = None
+_std_sql = r"""(?: %s | (?P<str> [E] %s | %s ) | %s )""" % (_ws, _extstr, _stdstr, _base_sql)
+_std_sql_fq = r"""(?: %s | (?P<str> [E] %s | %s ) | %s )""" % (_ws, _extstr, _stdstr, _base_sql_fq)
+_ext_sql = r"""(?: %s | (?P<str> [E]? %s ) | %s )""" % (_ws, _extstr, _base_sql)
+_ext_sql_fq = r"""(?: %s | (?P<str> [E]? %s ) | %s )""" % (_ws, _extstr, _base_sql_fq)
+_std_sql_rc = re.compile(_std_sql, re.X | re.I | re.S)
+_ext_sql_rc = re.compile(_ext_sql, re.X | re.I | re.S)
+_std_sql_fq_rc = re.compile(_std_sql_fq, re.X | re.I | re.S)
+_ext_sql_fq_rc = re.compile(_ext_sql_fq, re.X | re.I | re.S)
+
+# (standard_quoting, fqident) -> scanner
+_sql_scanners = {
+    (False, False): _ext_sql_rc,
+    (False, True): _ext_sql_fq_rc,
+    (True, False): _std_sql_rc,
+    (True, True): _std_sql_fq_rc,
+}
 
 
 def sql_tokenizer(
@@ -260,42 +298,21 @@ def sql_tokenizer(
 
     Iterator, returns (toktype, tokstr) tuples.
     """
-    global _std_sql_rc, _ext_sql_rc, _std_sql_fq_rc, _ext_sql_fq_rc
-    if not _std_sql_rc:
-        _std_sql_rc = re.compile(_std_sql, re.X | re.I | re.S)
-        _ext_sql_rc = re.compile(_ext_sql, re.X | re.I | re.S)
-        _std_sql_fq_rc = re.compile(_std_sql_fq, re.X | re.I | re.S)
-        _ext_sql_fq_rc = re.compile(_ext_sql_fq, re.X | re.I | re.S)
-
-    if standard_quoting:
-        if fqident:
-            rc = _std_sql_fq_rc
-        else:
-            rc = _std_sql_rc
-    else:
-        if fqident:
-            rc = _ext_sql_fq_rc
-        else:
-            rc = _ext_sql_rc
+    rc = _sql_scanners[bool(standard_quoting), bool(fqident)]
 
-    pos = 0
-    while True:
-        m = rc.match(sql, pos)
-        if not m:
-            break
-        pos = m.end()
+    # 'error' branch matches any char, so finditer() does not skip anything
+    for m in rc.finditer(sql):
         typ = m.lastgroup or '?'
         if ignore_whitespace and typ == "ws":
             continue
-        tk = m.group()
         if show_location:
-            yield (typ, tk, pos)
+            yield (typ, m.group(), m.end())
         else:
-            yield (typ, tk)
+            yield (typ, m.group())
 
 
 _copy_from_stdin_re = r"copy.*from\s+stdin"
-_copy_from_stdin_rc = None
+_copy_from_stdin_rc = re.compile(_copy_from_stdin_re, re.X | re.I)
 
 
 def parse_statements(sql: str, standard_quoting: bool = False) -> Iterator[str]:
@@ -304,35 +321,43 @@ def parse_statements(sql: str, standard_quoting: bool = False) -> Iterator[str]:
     Returns list of statements.
     """
 
-    global _copy_from_stdin_rc
-    if not _copy_from_stdin_rc:
-        _copy_from_stdin_rc = re.compile(_copy_from_stdin_re, re.X | re.I)
-    tokens: List[str] = []
+    # single statement without terminator or parens, no need to tokenize
+    if ";" not in sql and "(" not in sql and ")" not in sql:
+        stmt = sql.lstrip()
+        if not stmt.startswith(("--", "/*")):
+            if stmt:
+                yield stmt
+            return
+
+    start = -1  # start of current statement, -1 between statements
+    pos = 0
     pcount = 0  # '(' level
     for tmp in sql_tokenizer(sql, standard_quoting=standard_quoting):
         typ, t = tmp[0], tmp[1]
-        # skip whitespace and comments before statement
-        if len(tokens) == 0 and typ == "ws":
-            continue
-        # keep the rest
-        tokens.append(t)
+        tpos = pos
+        pos += len(t)
+        if start < 0:
+            # skip whitespace and comments before statement
+            if typ == "ws":
+                continue
+            start = tpos
         if t == "(":
             pcount += 1
         elif t == ")":
             pcount -= 1
         elif t == ";" and pcount == 0:
-            sql = "".join(tokens)
-            if _copy_from_stdin_rc.match(sql):
+            stmt = sql[start:pos]
+            if _copy_from_stdin_rc.match(stmt):
                 raise ValueError("copy from stdin not supported")
-            yield "".join(tokens)
-            tokens = []
-    if len(tokens) > 0:
-        yield "".join(tokens)
+            yield stmt
+            start = -1
+    if start >= 0:
+        yield sql[start:]
     if pcount != 0:
         raise ValueError("syntax error - unbalanced parenthesis")
 
 
-_acl_name = r'(?: [0-9a-z_]+ | " (?: [^"]+ | "" )* " )'
+_acl_name = r'(?: [0-9a-z_]+ | " [^"]* (?: "" [^"]* )* " )'
 _acl_re = r'''
     \s* (?: group \s+ | user \s+ )?
     (?P<tgt> %s )?
@@ -340,16 +365,12 @@ _acl_re = r'''
     (?P<owner> / %s )?
     \s* $
     ''' % (_acl_name, _acl_name)
-_acl_rc = None
+_acl_rc = re.compile(_acl_re, re.I | re.X)
 
 
 def parse_acl(acl: str) -> Optional[Tuple[Optional[str], str, Optional[str]]]:
     """Parse ACL entry.
     """
-    global _acl_rc
-    if not _acl_rc:
-        _acl_rc = re.compile(_acl_re, re.I | re.X)
-
     m = _acl_rc.match(acl)
     if not m:
         return None
@@ -395,39 +416,51 @@ def dedent(doc: str) -> str:
     return '\n'.join(res)
 
 
+_hsize_units = {u: 1 << (10 * i) for i, u in enumerate('KMGTPEZY', 1)}
+
+
 def hsize_to_bytes(input_str: str) -> int:
     """ Convert sizes from human format to bytes (string to integer)
     """
 
-    m = re.match(r"^([0-9]+) *([KMGTPEZY]?)B?$", input_str.strip(), re.IGNORECASE)
-    if not m:
+    s = input_str.strip().upper()
+    if s[-1:] == 'B':
+        s = s[:-1]
+    mul = _hsize_units.get(s[-1:], 1)
+    if mul > 1:
+        s = s[:-1]
+    s = s.rstrip(' ')
+    if not s.isdigit() or not s.isascii():
         raise ValueError("cannot parse: %s" % input_str)
-    units = ['', 'K', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y']
-    unit = m.group(2) or ''
-    nbytes = int(m.group(1)) * 1024 ** units.index(unit.upper())
-    assert isinstance(nbytes, int)
-    return nbytes
+    return int(s) * mul
 
 
 #
 # Connect string parsing
 #
 
-_cstr_rx = r""" \s* (\w+) \s* = \s* ( ' ( \\.| [^'\\] )* ' | \S+ ) \s* """
+_cstr_rx = r""" \s* (\w+) \s* = \s* ( ' [^'\\]* (?: \\. [^'\\]* )* ' | \S+ ) \s* """
 _cstr_unesc_rx = r"\\(.)"
 _cstr_badval_rx = r"[\s'\\]"
-_cstr_rc = None
-_cstr_unesc_rc = None
-_cstr_badval_rc = None
+_cstr_rc = re.compile(_cstr_rx, re.X)
+_cstr_unesc_rc = re.compile(_cstr_unesc_rx)
+_cstr_badval_rc = re.compile(_cstr_badval_rx)
 
 
 def parse_connect_string(cstr: str) -> List[Tuple[str, str]]:
     r"""Parse Postgres connect string.
     """
-    global _cstr_rc, _cstr_unesc_rc
-    if not _cstr_rc:
-        _cstr_rc = re.compile(_cstr_rx, re.X)
-        _cstr_unesc_rc = re.compile(_cstr_unesc_rx)
+    if "'" not in cstr and not cstr.isspace():
+        # common case: whitespace-separated key=value tokens
+        res = []
+        for tok in cstr.split():
+            k, _, v = tok.partition('=')
+            if not v or not k.replace('_', 'x').isalnum():
+                break
+            res.append((k, v))
+        else:
+            return res
+
     pos = 0
     res = []
     while pos < len(cstr):
@@ -446,10 +479,6 @@ def parse_connect_string(cstr: str) -> List[Tuple[str, str]]:
 def merge_connect_string(cstr_arg_list: Sequence[Tuple[str, str]]) -> str:
     """Put fragments back together.
     """
-    global _cstr_badval_rc
-    if not _cstr_badval_rc:
-        _cstr_badval_rc = re.compile(_cstr_badval_rx)
-
     buf = []
     for k, v in cstr_arg_list:
         if not v or _cstr_badval_rc.search(v):
@@ -10,7 +10,9 @@ See L{plpy_exec} for examples.
 """
 
 import json
+import operator
 import re
+import sys
 from functools import lru_cache
 from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union, cast
 
@@ -39,6 +41,29 @@ _RC_PARAM = re.compile(r"""
     ( \} )?
 """, re.X)
 
+_ScanItem = Tuple[str, str, Optional[str], Optional[str]]
+
+
+def scan_template_py(expr: str) -> Tuple[List[_ScanItem], str]:
+    """Split template into (sql, name, type, alt_frag) items for each placeholder
+    and trailing sql.
+    """
+    items: List[_ScanItem] = []
+    pos = 0
+    for m in _RC_PARAM.finditer(expr):
+        kparam, ktype, alt_frag, tag = m.groups()
+        if not kparam or not tag:
+            raise ValueError("invalid tag syntax: <%s>" % m.group(0))
+        items.append((expr[pos:m.start()], kparam, ktype, alt_frag))
+        pos = m.end()
+    return items, expr[pos:]
+
+
+try:
+    from skytools._cquerybuilder import scan_template
+except ImportError:
+    scan_template = scan_template_py
+
 
 def _inline_to_text(val: Any) -> Optional[str]:
     """Approx emulate PL/Python and Psycopg2 internal conversions
@@ -55,29 +80,6 @@ def _inline_to_text(val: Any) -> Optional[str]:
     return str(val)
 
 
-class QArgConf:
-    """Per-query arg-type config object."""
-    param_type = PARAM_INLINE
-
-
-class QArg:
-    """Place-holder for a query parameter."""
-    def __init__(self, name: str, value: Any, pos: int, conf: QArgConf):
-        self.name = name
-        self.value = value
-        self.pos = pos
-        self.conf = conf
-    def __str__(self) -> str:
-        if self.conf.param_type == PARAM_INLINE:
-            return skytools.quote_literal(_inline_to_text(self.value))
-        elif self.conf.param_type == PARAM_DBAPI:
-            return "%s"
-        elif self.conf.param_type == PARAM_PLPY:
-            return "$%d" % self.pos
-        else:
-            raise Exception("bad QArgConf.param_type")
-
-
 class PlanCache:
     """Cache for limited amount of plans."""
 
@@ -85,16 +87,14 @@ class PlanCache:
         self.maxplans = maxplans
 
         @lru_cache(maxplans)
-        def _cached_prepare(key: Tuple[str, Tuple[str, ...]]) -> Any:
-            sql, types = key
-            return plpy.prepare(sql, types)
+        def _cached_prepare(sql: str, types: Tuple[str, ...]) -> Any:
+            return plpy.prepare(sql, list(types))
 
         self._cached_prepare = _cached_prepare
 
     def get_plan(self, sql: str, types: Sequence[str]) -> Any:
         """Prepare the plan and cache it."""
-        key = (sql, tuple(types))
-        return self._cached_prepare(key)
+        return self._cached_prepare(sql, tuple(types))
 
 
 class QueryBuilderCore:
@@ -104,9 +104,8 @@ class QueryBuilderCore:
     _params: Optional[Mapping[str, Any]]
     _arg_type_list: List[str]
     _arg_value_list: List[Any]
-    _sql_parts: List[Union[str, QArg]]
-    _arg_conf: QArgConf
-    _nargs: int
+    _sql_literals: List[str]
+    _sql_cache: Dict[int, str]
 
     def __init__(self, sqlexpr: str, params: Optional[Mapping[str, Any]]):
         """Init the object.
@@ -117,9 +116,10 @@ class QueryBuilderCore:
         self._params = params
         self._arg_type_list = []
         self._arg_value_list = []
-        self._sql_parts = []
-        self._arg_conf = QArgConf()
-        self._nargs = 0
+        # plain sql around placeholders, always len(_arg_value_list) + 1
+        self._sql_literals = [""]
+        # rendered sql per param_type, reset on add
+        self._sql_cache = {}
 
         if sqlexpr:
             self.add(sqlexpr, required=True)
@@ -137,34 +137,57 @@ class QueryBuilderCore:
             - 1: Insert %()s in place of parameters.
             - 2: Insert $n in place of parameters.
         """
-        self._arg_conf.param_type = param_type
-        tmp = [str(part) for part in self._sql_parts]
+        sql = self._sql_cache.get(param_type)
+        if sql is not None:
+            return sql
+        if param_type == PARAM_INLINE:
+            quote_literal = skytools.quote_literal
+            args = [quote_literal(_inline_to_text(v)) for v in self._arg_value_list]
+        elif param_type == PARAM_DBAPI:
+            args = ["%s"] * len(self._arg_value_list)
+        elif param_type == PARAM_PLPY:
+            args = ["$%d" % n for n in range(1, len(self._arg_value_list) + 1)]
+        else:
+            raise Exception("bad param_type")
+        sql = self._join_literals(args)
+        self._sql_cache[param_type] = sql
+        return sql
+
+    def _join_literals(self, args: List[str]) -> str:
+        """Interleave sql literals with rendered args.
+        """
+        tmp = [""] * (2 * len(args) + 1)
+        tmp[::2] = self._sql_literals
+        tmp[1::2] = args
         return "".join(tmp)
 
+    def _get_sql_inline_plpy(self) -> Tuple[str, str]:
+        """Render PARAM_INLINE and PARAM_PLPY SQL in single pass.
+        """
+        cache = self._sql_cache
+        if PARAM_INLINE in cache or PARAM_PLPY in cache:
+            return self.get_sql(PARAM_INLINE), self.get_sql(PARAM_PLPY)
+        quote_literal = skytools.quote_literal
+        inline_args: List[str] = []
+        plpy_args: List[str] = []
+        for n, v in enumerate(self._arg_value_list, 1):
+            inline_args.append(quote_literal(_inline_to_text(v)))
+            plpy_args.append("$%d" % n)
+        cache[PARAM_INLINE] = inline_sql = self._join_literals(inline_args)
+        cache[PARAM_PLPY] = plpy_sql = self._join_literals(plpy_args)
+        return inline_sql, plpy_sql
+
     def _add_expr(self, pfx: str, expr: str,
                   params: Optional[Mapping[str, Any]], sql_type: str, required: bool) -> None:
-        parts: List[Union[str, QArg]] = []
+        literals: List[str] = []
         types: List[str] = []
         values: List[Any] = []
-        nargs = self._nargs
-        if pfx:
-            parts.append(pfx)
-        pos = 0
-        while True:
-            # find next argument
-            m = _RC_PARAM.search(expr, pos)
-            if not m:
-                parts.append(expr[pos:])
-                break
-
+        items, tail = scan_template(expr)
+        # plain sql collected since last arg
+        cur = pfx
+        for sql, kparam, ktype, alt_frag in items:
             # add plain sql
-            parts.append(expr[pos:m.start()])
-            pos = m.end()
-
-            # get arg name and type
-            kparam, ktype, alt_frag, tag = m.groups()
-            if not kparam or not tag:
-                raise ValueError("invalid tag syntax: <%s>" % m.group(0))
+            cur += sql
             if not ktype:
                 ktype = sql_type
 
@@ -172,33 +195,36 @@ class QueryBuilderCore:
             if params is None:
                 if alt_frag is not None:
                     raise ValueError("alt_frag not supported with params=None")
-            elif kparam not in params:
-                if alt_frag is not None:
-                    parts.append(alt_frag)
-                    continue
-                elif required:
-                    raise Exception("required parameter missing: " + kparam)
-                # optional fragment, param missing, skip it
-                return
+                val = kparam
+            else:
+                try:
+                    val = params[kparam]
+                except KeyError:
+                    if alt_frag is not None:
+                        cur += alt_frag
+                        continue
+                    elif required:
+                        raise Exception("required parameter missing: " + kparam) from None
+                    # optional fragment, param missing, skip it
+                    return
 
             # got arg
-            nargs += 1
-            if params is not None:
-                val = params[kparam]
-            else:
-                val = kparam
             values.append(val)
             types.append(ktype)
-            arg = QArg(kparam, val, nargs, self._arg_conf)
-            parts.append(arg)
-
-        # add interesting parts to the main sql
-        self._sql_parts.extend(parts)
-        if types:
-            self._arg_type_list.extend(types)
+            # share short repeating fragments
+            literals.append(sys.intern(cur) if len(cur) < 64 else cur)
+            cur = ""
+        cur += tail
+        literals.append(sys.intern(cur) if len(cur) < 64 else cur)
+
+        # add interesting parts to the main sql, first literal
+        # continues the last one
+        self._sql_cache.clear()
+        self._sql_literals[-1] += literals[0]
         if values:
+            self._sql_literals.extend(literals[1:])
+            self._arg_type_list.extend(types)
             self._arg_value_list.extend(values)
-        self._nargs = nargs
 
 
 class QueryBuilder(QueryBuilderCore):
@@ -252,9 +278,10 @@ class PLPyQueryBuilder(QueryBuilderCore):
         types = self._arg_type_list
 
         if self._sqls is not None:
-            self._sqls.append({"sql": self.get_sql(PARAM_INLINE)})
-
-        sql = self.get_sql(PARAM_PLPY)
+            inline_sql, sql = self._get_sql_inline_plpy()
+            self._sqls.append({"sql": inline_sql})
+        else:
+            sql = self.get_sql(PARAM_PLPY)
         if self._plan_cache is not None:
             plan = self._plan_cache.get_plan(sql, types)
         else:
@@ -267,25 +294,39 @@ class PLPyQueryBuilder(QueryBuilderCore):
             return []
 
 
+@lru_cache(512)
+def _parse_plpy_query(sql: str) -> Tuple[str, Tuple[str, ...], Tuple[str, ...]]:
+    """Parse static query once, return plpy sql, arg types and arg names."""
+    qb = QueryBuilder(sql, None)
+    return qb.get_sql(PARAM_PLPY), tuple(qb._arg_type_list), tuple(qb._arg_value_list)
+
+
 class PLPyQuery:
     """Static, cached PL/Python query that uses QueryBuilder formatting.
 
     See L{plpy_exec} for simple usage.
     """
     def __init__(self, sql: str) -> None:
-        qb = QueryBuilder(sql, None)
-        p_sql = qb.get_sql(PARAM_PLPY)
-        p_types = qb._arg_type_list
-        self.plan = plpy.prepare(p_sql, p_types)
-        self.arg_map = qb._arg_value_list
+        p_sql, p_types, arg_map = _parse_plpy_query(sql)
+        self.plan = plpy.prepare(p_sql, list(p_types))
+        self.arg_map = list(arg_map)
         self.sql = sql
+        # itemgetter returns scalar for single key, tuple for several
+        self._getter = operator.itemgetter(*arg_map) if arg_map else None
+        self._multi_key = len(arg_map) > 1
 
     def execute(self, arg_dict: Optional[Mapping[str, Any]], all_keys_required: bool = True) -> List[skytools.dbdict]:
         if arg_dict is None:
             arg_dict = {}
         try:
             if all_keys_required:
-                arg_list = [arg_dict[k] for k in self.arg_map]
+                getter = self._getter
+                if getter is None:
+                    arg_list = []
+                elif self._multi_key:
+                    arg_list = list(getter(arg_dict))
+                else:
+                    arg_list = [getter(arg_dict)]
             else:
                 arg_list = [arg_dict.get(k) for k in self.arg_map]
             res = plpy.execute(self.plan, arg_list)
@@ -333,6 +374,39 @@ def plpy_exec(gd: Optional[Dict[str, Any]],
 
 # some helper functions for convenient sql execution
 
+_TemplatePart = Union[str, Tuple[str, Optional[str]]]
+
+
+@lru_cache(1024)
+def _parse_inline_template(sql: str) -> Tuple[_TemplatePart, ...]:
+    """Split query into plain sql and (name, alt_frag) placeholders."""
+    parts: List[_TemplatePart] = []
+    items, tail = scan_template(sql)
+    for frag, kparam, _, alt_frag in items:
+        parts.append(frag)
+        parts.append((kparam, alt_frag))
+    parts.append(tail)
+    return tuple(parts)
+
+
+def _render_inline(sql: str, params: Mapping[str, Any]) -> str:
+    """Same as QueryBuilder(sql, params).get_sql(PARAM_INLINE), with cached parse."""
+    quote_literal = skytools.quote_literal
+    res = []
+    for part in _parse_inline_template(sql):
+        if isinstance(part, str):
+            res.append(part)
+            continue
+        kparam, alt_frag = part
+        if kparam in params:
+            res.append(quote_literal(_inline_to_text(params[kparam])))
+        elif alt_frag is not None:
+            res.append(alt_frag)
+        else:
+            raise Exception("required parameter missing: " + kparam)
+    return "".join(res)
+
+
 def run_query(cur: Cursor, sql: str,
               params: Optional[Mapping[str, Any]] = None,
               **kwargs: Any
@@ -342,7 +416,7 @@ def run_query(cur: Cursor, sql: str,
         want to know how many rows were affected
     """
     params = params or kwargs
-    sql = QueryBuilder(sql, params).get_sql(0)
+    sql = _render_inline(sql, params)
     cur.execute(sql)
     rows = cur.fetchall()
     # convert result rows to dbdict
@@ -368,7 +442,7 @@ def run_lookup(cur: Cursor, sql: str, params: Optional[Mapping[str, Any]] = None
         and processing returned result giving out just one value.
     """
     params = params or kwargs
-    sql = QueryBuilder(sql, params).get_sql(0)
+    sql = _render_inline(sql, params)
     cur.execute(sql)
     row = cur.fetchone()
     if row is None:
@@ -1,9 +1,10 @@
 """Various helpers for string quoting/unquoting.
 """
 
-import json
-import re
-from typing import Any, Dict, Mapping, Match, Optional, Sequence, Union
+from json import dumps as _json_dumps
+from json import loads as _json_loads
+from json.encoder import encode_basestring
+from typing import Any, Mapping, Optional, Sequence, Union
 
 try:
     from skytools._cquoting import (
@@ -51,13 +52,9 @@ def quote_statement(sql: str, dict_or_list: Union[Mapping[str, Any], Sequence[An
     Data values are taken from dict or list or tuple.
     """
     if hasattr(dict_or_list, 'items'):
-        qdict: Dict[str, str] = {}
-        for k, v in dict_or_list.items():
-            qdict[k] = quote_literal(v)
-        return sql % qdict
+        return sql % {k: quote_literal(v) for k, v in dict_or_list.items()}
     else:
-        qvals = [quote_literal(v) for v in dict_or_list]
-        return sql % tuple(qvals)
+        return sql % tuple(map(quote_literal, dict_or_list))
 
 
 # reserved keywords (RESERVED_KEYWORD + TYPE_FUNC_NAME_KEYWORD + COL_NAME_KEYWORD)
@@ -78,7 +75,7 @@ _ident_kwmap = frozenset("""
     xmlexists xmlforest xmlnamespaces xmlparse xmlpi xmlroot xmlserialize xmltable
 """.split())
 
-_ident_bad = re.compile(r"[^a-z0-9_]|^[0-9]")
+_ident_good = frozenset("abcdefghijklmnopqrstuvwxyz0123456789_")
 
 
 def quote_ident(s: str) -> str:
@@ -87,11 +84,11 @@ def quote_ident(s: str) -> str:
     If is checked against weird symbols and keywords.
     """
 
-    if _ident_bad.search(s) or s in _ident_kwmap:
-        s = '"%s"' % s.replace('"', '""')
+    if s and s[0] not in "0123456789" and _ident_good.issuperset(s) and s not in _ident_kwmap:
+        return s
     elif not s:
         return '""'
-    return s
+    return '"%s"' % s.replace('"', '""')
 
 
 def quote_fqident(s: str) -> str:
@@ -100,38 +97,22 @@ def quote_fqident(s: str) -> str:
     The '.' is taken as namespace separator and
     all parts are quoted separately
     """
-    tmp = s.split('.', 1)
-    if len(tmp) == 1:
+    schema, sep, name = s.partition('.')
+    if not sep:
         return 'public.' + quote_ident(s)
-    return '.'.join([quote_ident(name) for name in tmp])
+    return quote_ident(schema) + '.' + quote_ident(name)
 
 
 #
 # quoting for JSON strings
 #
 
-_jsre = re.compile(r'[\x00-\x1F\\/"]')
-_jsmap = {
-    "\b": "\\b", "\f": "\\f", "\n": "\\n", "\r": "\\r",
-    "\t": "\\t", "\\": "\\\\", '"': '\\"',
-    "/": "\\/",   # to avoid html attacks
-}
-
-
-def _json_quote_char(m: Match[str]) -> str:
-    """Quote single char."""
-    c = m.group(0)
-    try:
-        return _jsmap[c]
-    except KeyError:
-        return r"\u%04x" % ord(c)
-
-
 def quote_json(s: Optional[str]) -> str:
     """JSON style quoting."""
     if s is None:
         return "null"
-    return '"%s"' % _jsre.sub(_json_quote_char, s)
+    # escape "/" too, to avoid html attacks
+    return encode_basestring(s).replace("/", "\\/")
 
 
 def unescape_copy(val: str) -> Optional[str]:
@@ -155,20 +136,22 @@ def unquote_ident(val: str) -> str:
 def unquote_fqident(val: str) -> str:
     """Unquotes fully-qualified possibly quoted SQL identifier.
     """
-    tmp = val.split('.', 1)
-    return '.'.join([unquote_ident(i) for i in tmp])
+    schema, sep, name = val.partition('.')
+    if not sep:
+        return unquote_ident(val)
+    return unquote_ident(schema) + '.' + unquote_ident(name)
 
 
 def json_encode(val: Any = None, **kwargs: Any) -> str:
     """Creates JSON string from Python object.
     """
-    return json.dumps(val or kwargs)
+    return _json_dumps(kwargs if val is None else val)
 
 
 def json_decode(s: str) -> Any:
     """Parses JSON string into Python object.
     """
-    return json.loads(s)
+    return _json_loads(s)
 
 
 #
@@ -176,15 +159,17 @@ def json_decode(s: str) -> Any:
 #
 
 # any chars not in "good" set?  main bad ones: [ ,{}\"]
-_pgarray_bad_rx = r"[^0-9a-z_.%&=()<>*/+-]"
-_pgarray_bad_rc = re.compile(_pgarray_bad_rx)
+_pgarray_good = frozenset("0123456789abcdefghijklmnopqrstuvwxyz_.%&=()<>*/+-")
 
 
 def _quote_pgarray_elem(value: Any) -> str:
     if value is None:
         return 'NULL'
+    if type(value) is int:
+        # digits and '-' never need quoting
+        return str(value)
     s = str(value)
-    if _pgarray_bad_rc.search(s):
+    if not _pgarray_good.issuperset(s):
         s = s.replace('\\', '\\\\')
         return '"' + s.replace('"', r'\"') + '"'
     elif not s:
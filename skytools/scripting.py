@@ -8,11 +8,17 @@ import logging.config
 import logging.handlers
 import optparse
 import os
+import re
 import select
 import signal
 import sys
 import time
-from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type, Union, cast
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple, Type, Union, cast
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None    # type: ignore
 
 import skytools
 import skytools.skylog
@@ -45,10 +51,15 @@ def daemonize() -> None:
     Goes background and disables all i/o.
     """
 
-    # launch new process, kill parent
+    # launch new process, kill parent when child has left the session,
+    # so parent exit cannot send it SIGHUP
+    rfd, wfd = os.pipe()
     pid = os.fork()
     if pid != 0:
+        os.close(wfd)
+        os.read(rfd, 1)
         os._exit(0)
+    os.close(rfd)
 
     # start new session
     os.setsid()
@@ -61,42 +72,164 @@ def daemonize() -> None:
     if fd > 2:
         os.close(fd)
 
+    # release parent
+    os.write(wfd, b"\0")
+    os.close(wfd)
+
 
 #
 # Pidfile locking+cleanup & daemonization combined
 #
 
+def _lock_pidfile(fd: int) -> bool:
+    """Take exclusive lock on pidfile, return False if held by other process.
+
+    If locking is not available, returns True and liveness
+    is left to signal_pidfile().
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    except OSError:
+        # ENOLCK, EOPNOTSUPP, EINVAL on some NFS/FUSE mounts
+        return True
+    return True
+
+
+def _write_pid(fd: int) -> None:
+    """Overwrite pidfile contents with current pid."""
+    data = str(os.getpid()).encode()
+    os.lseek(fd, 0, os.SEEK_SET)
+    os.write(fd, data)
+    os.ftruncate(fd, len(data))
+
+
+def _create_pidfile(pidfile: str) -> Optional[int]:
+    """Create pidfile with current pid and keep it locked.
+
+    File is locked and filled under temp name, then linked
+    into place, so it never appears unlocked or empty.
+
+    Without fcntl (win32) there is no lock to take, and open
+    file cannot be removed, so pidfile is created directly.
+
+    Returns open fd, or None if pidfile exists already.
+    """
+    if fcntl is None:
+        try:
+            fd = os.open(pidfile, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o644)
+        except FileExistsError:
+            return None
+        try:
+            _write_pid(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    tmpfile = "%s.%d.tmp" % (pidfile, os.getpid())
+    fd = os.open(tmpfile, os.O_CREAT | os.O_TRUNC | os.O_RDWR, 0o644)
+    try:
+        # nobody else knows the temp file, so lock cannot be held
+        _lock_pidfile(fd)
+        _write_pid(fd)
+        os.link(tmpfile, pidfile)
+    except FileExistsError:
+        os.close(fd)
+        return None
+    except BaseException:
+        os.close(fd)
+        raise
+    finally:
+        os.remove(tmpfile)
+    return fd
+
+
+def _take_pidfile(pidfile: str) -> Optional[int]:
+    """Create pidfile or take over stale one.
+
+    Stale file is never removed, but rewritten in place under lock,
+    so concurrent starters cannot delete each other's pidfile.
+
+    Returns locked fd, or None if another process is running.
+    """
+    while True:
+        fd = _create_pidfile(pidfile)
+        if fd is not None:
+            return fd
+
+        try:
+            fd = os.open(pidfile, os.O_RDWR)
+        except FileNotFoundError:
+            continue
+        try:
+            if not _lock_pidfile(fd):
+                os.close(fd)
+                return None
+
+            # owner may have removed it before we got the lock
+            try:
+                st = os.stat(pidfile)
+            except FileNotFoundError:
+                os.close(fd)
+                continue
+            fst = os.fstat(fd)
+            if (st.st_dev, st.st_ino) != (fst.st_dev, fst.st_ino):
+                os.close(fd)
+                continue
+
+            # unlocked file may come from process that does not lock
+            if skytools.signal_pidfile(pidfile, 0):
+                os.close(fd)
+                return None
+
+            print("Ignoring stale pidfile")
+            _write_pid(fd)
+            return fd
+        except BaseException:
+            os.close(fd)
+            raise
+
+
 def run_single_process(runnable: Runnable, daemon: bool, pidfile: Optional[str]) -> None:
     """Run runnable class, possibly daemonized, locked on pidfile."""
 
-    # check if another process is running
-    if pidfile and os.path.isfile(pidfile):
-        if skytools.signal_pidfile(pidfile, 0):
+    # create pidfile, unless another process is running
+    pidfile_fd = None
+    if pidfile:
+        pidfile_fd = _take_pidfile(pidfile)
+        if pidfile_fd is None:
             print("Pidfile exists, another process running?")
             sys.exit(1)
-        else:
-            print("Ignoring stale pidfile")
-
-    # daemonize if needed
-    if daemon:
-        daemonize()
-
-    # clean only own pidfile
-    own_pidfile = False
 
     try:
-        if pidfile:
-            data = str(os.getpid())
-            skytools.write_atomic(pidfile, data)
-            own_pidfile = True
+        # daemonize if needed, pid changes.  Daemon inherits
+        # the locked fd, so rewrite in place.
+        if daemon:
+            daemonize()
+            if pidfile_fd is not None:
+                _write_pid(pidfile_fd)
 
         runnable.run()
     finally:
-        if own_pidfile and pidfile:
+        # clean only own pidfile.  Remove it while still locked,
+        # so nobody sees unlocked file with live pid.
+        if pidfile_fd is not None and pidfile:
             try:
                 os.remove(pidfile)
-            except BaseException:
-                pass
+                removed = True
+            except OSError:
+                removed = False
+            os.close(pidfile_fd)
+            if not removed:
+                # win32 cannot remove open file
+                try:
+                    os.remove(pidfile)
+                except OSError:
+                    pass
 
 
 #
@@ -104,14 +237,49 @@ def run_single_process(runnable: Runnable, daemon: bool, pidfile: Optional[str])
 #
 
 _log_config_done: int = 0
-_log_init_done: Dict[str, int] = {}
+_log_init_done: Set[str] = set()
+
+
+def _load_skylog_config(job_name: str, service_name: str, cf: skytools.Config) -> bool:
+    """Load skylog.ini, once per process.
+
+    Returns True if config was loaded by this call.
+    """
+    global _log_config_done
+
+    if _log_config_done:
+        return False
+
+    # python logging.config braindamage:
+    # cannot specify external classess without such hack
+    logging.skylog = skytools.skylog    # type: ignore
+    skytools.skylog.set_service_name(service_name, job_name)
+
+    # load general config
+    flist = cf.getlist('skylog_locations',
+                       ['skylog.ini', '~/.skylog.ini', '/etc/skylog.ini'])
+    for fn in flist:
+        fn = os.path.expanduser(fn)
+        if os.path.isfile(fn):
+            defs = {'job_name': job_name, 'service_name': service_name}
+            logging.config.fileConfig(fn, defs, False)
+            _log_config_done = 1
+            return True
+    _log_config_done = 1
+    sys.stderr.write("skylog.ini not found!\n")
+    sys.exit(1)
 
 
 def _init_log(job_name: str, service_name: str, cf: skytools.Config, log_level: int, is_daemon: bool) -> logging.Logger:
     """Logging setup happens here."""
-    global _log_config_done
 
-    got_skylog = 0
+    # avoid duplicate logging init for job_name
+    log = logging.getLogger(job_name)
+    if job_name in _log_init_done:
+        return log
+    _log_init_done.add(job_name)
+
+    got_skylog = False
     use_skylog = cf.getint("use_skylog", default_skylog)
 
     # if non-daemon, avoid skylog if script is running on console.
@@ -123,32 +291,8 @@ def _init_log(job_name: str, service_name: str, cf: skytools.Config, log_level:
             use_skylog = 0
 
     # load logging config if needed
-    if use_skylog and not _log_config_done:
-        # python logging.config braindamage:
-        # cannot specify external classess without such hack
-        logging.skylog = skytools.skylog    # type: ignore
-        skytools.skylog.set_service_name(service_name, job_name)
-
-        # load general config
-        flist = cf.getlist('skylog_locations',
-                           ['skylog.ini', '~/.skylog.ini', '/etc/skylog.ini'])
-        for fn in flist:
-            fn = os.path.expanduser(fn)
-            if os.path.isfile(fn):
-                defs = {'job_name': job_name, 'service_name': service_name}
-                logging.config.fileConfig(fn, defs, False)
-                got_skylog = 1
-                break
-        _log_config_done = 1
-        if not got_skylog:
-            sys.stderr.write("skylog.ini not found!\n")
-            sys.exit(1)
-
-    # avoid duplicate logging init for job_name
-    log = logging.getLogger(job_name)
-    if job_name in _log_init_done:
-        return log
-    _log_init_done[job_name] = 1
+    if use_skylog:
+        got_skylog = _load_skylog_config(job_name, service_name, cf)
 
     # tune level on root logger
     root = logging.getLogger()
@@ -255,6 +399,10 @@ class BaseScript:
     # set to True to use argparse
     ARGPARSE: bool = False
 
+    # parsers from non-overridden init_argparse/init_optparse, shared by all instances
+    _base_argparser: Optional[argparse.ArgumentParser] = None
+    _base_optparser: Optional[optparse.OptionParser] = None
+
     def __init__(self, service_name: str, args: Sequence[str]) -> None:
         """Script setup.
 
@@ -318,14 +466,29 @@ class BaseScript:
 
     def parse_args(self, args: Sequence[str]) -> Tuple[Any, Sequence[str]]:
         if self.ARGPARSE:
-            arg_parser = self.init_argparse()
+            arg_parser = self._get_argparser()
             options = arg_parser.parse_args(args)
             args = getattr(options, "args", [])
             return options, args
-        opt_parser = self.init_optparse()
+        opt_parser = self._get_optparser()
         options2, args2 = opt_parser.parse_args(args)
         return options2, args2
 
+    def _get_argparser(self) -> argparse.ArgumentParser:
+        # overridden init_argparse may depend on instance, build each time
+        if type(self).init_argparse is not BaseScript.init_argparse:
+            return self.init_argparse()
+        if BaseScript._base_argparser is None:
+            BaseScript._base_argparser = self.init_argparse()
+        return BaseScript._base_argparser
+
+    def _get_optparser(self) -> optparse.OptionParser:
+        if type(self).init_optparse is not BaseScript.init_optparse:
+            return self.init_optparse()
+        if BaseScript._base_optparser is None:
+            BaseScript._base_optparser = self.init_optparse()
+        return BaseScript._base_optparser
+
     def print_version(self) -> None:
         service = self.service_name
         ver = getattr(self, '__version__', None)
@@ -343,21 +506,14 @@ class BaseScript:
         print("[%s]\n" % self.service_name)
 
         # walk class hierarchy
-        bases = [self.__class__]
-        while len(bases) > 0:
-            parents = []
-            for c in bases:
-                for p in c.__bases__:
-                    if p not in parents:
-                        parents.append(p)
-                doc = c.__doc__
-                if doc:
-                    self._print_ini_frag(doc)
-            bases = parents
+        for c in self.__class__.__mro__:
+            doc = c.__doc__
+            if doc:
+                self._print_ini_frag(doc)
 
     def _print_ini_frag(self, doc: str) -> None:
         # use last '::' block as config template
-        pos = doc and doc.rfind('::\n') or -1
+        pos = doc.rfind('::\n') if doc else -1
         if pos < 0:
             return
         doc = doc[pos + 2:].rstrip()
@@ -365,13 +521,13 @@ class BaseScript:
 
         # merge overrided options into output
         for ln in doc.splitlines():
-            vals = ln.split('=', 1)
-            if len(vals) != 2:
+            k, sep, v = ln.partition('=')
+            if not sep:
                 print(ln)
                 continue
 
-            k = vals[0].strip()
-            v = vals[1].strip()
+            k = k.strip()
+            v = v.strip()
             if k and k[0] == '#':
                 print(ln)
                 k = k[1:]
@@ -497,12 +653,12 @@ class BaseScript:
     def send_signal(self, sig: int) -> None:
         if not self.pidfile:
             self.log.warning("No pidfile in config, nothing to do")
-        elif os.path.isfile(self.pidfile):
-            alive = skytools.signal_pidfile(self.pidfile, sig)
-            if not alive:
+        elif not skytools.signal_pidfile(self.pidfile, sig):
+            # stat only to pick the message
+            if os.path.isfile(self.pidfile):
                 self.log.warning("pidfile exists, but process not running")
-        else:
-            self.log.warning("No pidfile, process not running")
+            else:
+                self.log.warning("No pidfile, process not running")
         sys.exit(0)
 
     def set_single_loop(self, do_single_loop: int) -> None:
@@ -539,7 +695,7 @@ class BaseScript:
         self.pidfile = self.cf.getfile("pidfile", '')
         self.loop_delay = self.cf.getfloat("loop_delay", self.loop_delay)
         self.exception_sleep = self.cf.getfloat("exception_sleep", 20)
-        self.exception_quiet = self.cf.getlist("exception_quiet", [])
+        self.exception_quiet = frozenset(self.cf.getlist("exception_quiet", []))
         self.exception_grace = self.cf.getfloat("exception_grace", 5 * 60)
         self.exception_reset = self.cf.getfloat("exception_reset", 15 * 60)
 
@@ -552,7 +708,7 @@ class BaseScript:
     def hook_sigint(self, sig: int, frame: Any) -> None:
         "Internal SIGINT handler.  Minimal code here."
         self.stop()
-        t = time.time()
+        t = time.monotonic()
         if t - self.last_sigint < 1:
             self.log.warning("Double ^C, fast exit")
             sys.exit(1)
@@ -579,15 +735,12 @@ class BaseScript:
     def send_stats(self) -> None:
         "Send statistics to log."
 
-        res = []
-        for k, v in self.stat_dict.items():
-            res.append("%s: %s" % (k, v))
-
-        if len(res) == 0:
+        if not self.stat_dict:
             return
 
-        logmsg = "{%s}" % ", ".join(res)
-        self.log.info(logmsg)
+        if self.log.isEnabledFor(logging.INFO):
+            logmsg = "{%s}" % ", ".join(["%s: %s" % kv for kv in self.stat_dict.items()])
+            self.log.info(logmsg)
         self.stat_dict = {}
 
     def reset(self) -> None:
@@ -643,7 +796,7 @@ class BaseScript:
         "Run users work function, safely."
         try:
             r = func()
-            if self.last_func_fail and time.time() > self.last_func_fail + self.exception_reset:
+            if self.last_func_fail and time.monotonic() > self.last_func_fail + self.exception_reset:
                 self.last_func_fail = None
             # set exception count to 0 after success
             self.exception_count = 0
@@ -675,7 +828,7 @@ class BaseScript:
             except BaseException:
                 pass
             if self.last_func_fail is None:
-                self.last_func_fail = time.time()
+                self.last_func_fail = time.monotonic()
             emsg = str(d).rstrip()
             self.reset()
             self.exception_hook(d, emsg)
@@ -707,7 +860,7 @@ class BaseScript:
 
     def _is_quiet_exception(self, ex: Exception) -> bool:
         if "ALL" in self.exception_quiet or ex.__class__.__name__ in self.exception_quiet:
-            if self.last_func_fail and time.time() < self.last_func_fail + self.exception_grace:
+            if self.last_func_fail and time.monotonic() < self.last_func_fail + self.exception_grace:
                 return True
         return False
 
@@ -768,6 +921,10 @@ class BaseScript:
 DEF_CONN_AGE = 20 * 60  # 20 min
 
 
+#: cuts password off logged connect string
+_RC_PASSWORD = re.compile(r"password", re.I)
+
+
 class DBScript(BaseScript):
     """Base class for database scripts.
 
@@ -784,6 +941,9 @@ class DBScript(BaseScript):
     db_cache: Dict[str, "DBCachedConn"]
     _db_defaults: Dict[str, Mapping[str, int]]
     _listen_map: Dict[str, List[str]]
+    _connection_lifetime: int
+    _connstr_cache: Dict[str, str]
+    _extra_connstr_cache: Dict[str, str]
 
     def __init__(self, service_name: str, args: Sequence[str]) -> None:
         """Script setup.
@@ -803,6 +963,13 @@ class DBScript(BaseScript):
         self._listen_map = {}  # dbname: channel_list
         super().__init__(service_name, args)
 
+    def reload(self) -> None:
+        "Reload config, drop cached connection settings."
+        super().reload()
+        self._connection_lifetime = self.cf.getint('connection_lifetime', DEF_CONN_AGE)
+        self._connstr_cache = {}
+        self._extra_connstr_cache = {}
+
     def connection_hook(self, dbname: str, conn: Connection) -> None:
         pass
 
@@ -813,7 +980,11 @@ class DBScript(BaseScript):
         """Add extra profile info to connect string.
         """
         if profile:
-            extra = self.cf.get("%s_extra_connstr" % profile, '')
+            try:
+                extra = self._extra_connstr_cache[profile]
+            except KeyError:
+                extra = self.cf.get("%s_extra_connstr" % profile, '')
+                self._extra_connstr_cache[profile] = extra
             if extra:
                 connstr += ' ' + extra
         return connstr
@@ -827,15 +998,12 @@ class DBScript(BaseScript):
         as all connections will be invalidated on reset.
         """
 
-        max_age = self.cf.getint('connection_lifetime', DEF_CONN_AGE)
+        max_age = self._connection_lifetime
 
         if not cache:
             cache = dbname
 
-        params: Dict[str, int] = {}
-        defs = self._db_defaults.get(cache, {})
-        for k in defs:
-            params[k] = defs[k]
+        params: Dict[str, int] = dict(self._db_defaults.get(cache, ()))
         if isolation_level >= 0:
             params['isolation_level'] = isolation_level
         elif autocommit:
@@ -851,7 +1019,11 @@ class DBScript(BaseScript):
         if cache in self.db_cache:
             dbc = self.db_cache[cache]
             if connstr is None:
-                connstr = self.cf.get(dbname, '')
+                try:
+                    connstr = self._connstr_cache[dbname]
+                except KeyError:
+                    connstr = self.cf.get(dbname, '')
+                    self._connstr_cache[dbname] = connstr
             if connstr:
                 connstr = self.add_connect_string_profile(connstr, profile)
                 dbc.check_connstr(connstr)
@@ -860,13 +1032,14 @@ class DBScript(BaseScript):
                 connstr = self.cf.get(dbname)
             connstr = self.add_connect_string_profile(connstr, profile)
 
-            # connstr might contain password, it is not a good idea to log it
-            filtered_connstr = connstr
-            pos = connstr.lower().find('password')
-            if pos >= 0:
-                filtered_connstr = connstr[:pos] + ' [...]'
+            if self.log.isEnabledFor(logging.DEBUG):
+                # connstr might contain password, it is not a good idea to log it
+                filtered_connstr = connstr
+                m = _RC_PASSWORD.search(connstr)
+                if m:
+                    filtered_connstr = connstr[:m.start()] + ' [...]'
 
-            self.log.debug("Connect '%s' to '%s'", cache, filtered_connstr)
+                self.log.debug("Connect '%s' to '%s'", cache, filtered_connstr)
             dbc = DBCachedConn(cache, connstr, params['max_age'], setup_func=self.connection_hook)
             self.db_cache[cache] = dbc
 
@@ -1057,7 +1230,7 @@ class DBScript(BaseScript):
         sql_retry_formula_b = self.cf.getint("sql_retry_formula_b", 5)
         sql_retry_formula_cap = self.cf.getint("sql_retry_formula_cap", 60)
         elist = tuple(exceptions) if exceptions else ()
-        stime = time.time()
+        stime = time.monotonic()
         tried = 0
         dbc: Optional[DBCachedConn] = None
         while True:
@@ -1074,7 +1247,7 @@ class DBScript(BaseScript):
                 curs.execute(stmt, args)
                 break
             except elist as e:
-                if not sql_retry or tried >= sql_retry_max_count or time.time() - stime >= sql_retry_max_time:
+                if not sql_retry or tried >= sql_retry_max_count or time.monotonic() - stime >= sql_retry_max_time:
                     raise
                 self.log.info("Job %s got error on connection %s: %s", self.job_name, dbname, e)
             except BaseException:
@@ -128,6 +128,24 @@ def test_config_other() -> None:
     assert len(cf2.items()) == len(cf2.options())
 
 
+def test_clone() -> None:
+    cf = Config('base', CONFIG, override={'foo': 'overrided'})
+    cf2 = cf.clone('other')
+    assert cf2.get('test') == 'try'
+    assert cf2.get('service_name') == 'other'
+    assert cf2.get('foo', 'none') == 'none'
+
+    # parsers are independent
+    cf2.cf.set('other', 'test', 'changed')
+    assert cf.cf.get('other', 'test') == 'try'
+
+    cf3 = cf.clone('base')
+    assert cf3.get('foo') == '1'
+
+    with pytest.raises(NoSectionError):
+        cf.clone('random')
+
+
 def test_loading() -> None:
     with pytest.raises(NoSectionError):
         Config('random', CONFIG)
@@ -151,12 +169,26 @@ def test_override() -> None:
     assert cf.get('foo') == 'overrided'
 
 
+def test_parsed_cache() -> None:
+    cf = Config('base', CONFIG, override={'foo': '5'})
+    assert cf.getint('foo') == 5
+    lst = cf.getlist('list-val2')
+    lst.append('x')
+    assert cf.getlist('list-val2') == ['a', '1', 'asd', 'ppp']
+
+    cf.override = {'foo': '7'}
+    cf.reload()
+    assert cf.getint('foo') == 7
+
+
 def test_vars() -> None:
     cf = Config('base', CONFIG)
     assert cf.get('vars1') == 'V2=V3=Q3'
 
     with pytest.raises(InterpolationError):
         cf.get('bad1')
+    with pytest.raises(InterpolationError):
+        cf.get('bad1', 'default')
 
 
 def test_extended_compat() -> None:
@@ -1,6 +1,7 @@
 
 from skytools.natsort import (
-    natsort, natsort_icase, natsort_key, natsorted, natsorted_icase,
+    natsort, natsort_icase, natsort_key, natsort_key_py,
+    natsorted, natsorted_icase,
 )
 
 
@@ -56,3 +57,12 @@ def test_natsort_order() -> None:
     assert _natcmp('', '1') == 'ok'
     assert _natcmp('', 'a') == 'ok'
 
+
+def test_natsort_key_impl() -> None:
+    data = [
+        '', '~', '~~1', 'a', '1', '0', '00', '000100', '0' * 11 + '1',
+        '1' * 12, 'ver-1.11~rc2', 'A1b22c333', ':|', '\0\1', 'x\u00e91\U0001d11e2',
+    ]
+    p = [natsort_key_py(s) for s in data]
+    c = [natsort_key(s) for s in data]
+    assert p == c
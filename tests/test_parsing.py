@@ -3,7 +3,7 @@ import pytest
 
 from skytools.parsing import (
     dedent, hsize_to_bytes, merge_connect_string, parse_acl,
-    parse_connect_string, parse_logtriga_sql, parse_pgarray,
+    parse_connect_string, parse_logtriga_sql, parse_pgarray, parse_pgarray_py,
     parse_sqltriga_sql, parse_statements, parse_tabbed_table, sql_tokenizer,
 )
 
@@ -14,6 +14,7 @@ def test_parse_pgarray() -> None:
     assert parse_pgarray(r'{"a,a","b\"b","c\\c"}') == ['a,a', 'b"b', 'c\\c']
     assert parse_pgarray("[0,3]={1,2,3}") == ['1', '2', '3']
     assert parse_pgarray(None) is None
+    assert parse_pgarray(r'{"x\\\"","}",NULL,"NULL"}') == ['x\\"', '}', None, 'NULL']
 
     with pytest.raises(ValueError):
         parse_pgarray('}{')
@@ -29,6 +30,29 @@ def test_parse_pgarray() -> None:
         parse_pgarray('{"..."}zzz')
     with pytest.raises(ValueError):
         parse_pgarray('{"..."}z')
+    with pytest.raises(ValueError):
+        parse_pgarray('{a,,b}')
+    with pytest.raises(ValueError):
+        parse_pgarray('{"a}')
+
+
+def test_parse_pgarray_impl() -> None:
+    data = [
+        '{}', '{a,b,NULL,"null"}', r'{"a,a","b\"b","c\\c"}', '[0,3]={1,2,3}',
+        '{"x\u00e9",y\U0001d11e}', '{a,,b}', '{"a}', '{"..." , }', '{a"b}', '[1]=}',
+    ]
+    for s in data:
+        p: object
+        c: object
+        try:
+            p = parse_pgarray_py(s)
+        except ValueError as ex:
+            p = str(ex)
+        try:
+            c = parse_pgarray(s)
+        except ValueError as ex:
+            c = str(ex)
+        assert p == c
 
 
 def test_parse_sqltriga_sql() -> None:
@@ -149,6 +173,12 @@ def test_sql_tokenizer() -> None:
         ('ident', 'a', 1), ('sym', '.', 2), ('ident', 'b', 3), ('ident', 'c', 5), ('sym', ';', 6)
     ]
 
+    # unterminated quotes must not backtrack exponentially
+    for sql in ['"' + 'a' * 5000, "'" + 'a' * 5000, "E'" + '\\' * 5000]:
+        for stdq in (False, True):
+            res = sql_tokenizer(sql, standard_quoting=stdq, fqident=True)
+            assert list(res)[0][0] in ('error', 'ident')
+
 
 def test_parse_statements() -> None:
     res = parse_statements("begin; select 1; select 'foo'; end;")
@@ -157,6 +187,10 @@ def test_parse_statements() -> None:
     res = parse_statements("select (select 2+(select 3;);) ; select 4;")
     assert list(res) == ['select (select 2+(select 3;);) ;', 'select 4;']
 
+    assert list(parse_statements("  select 1\n")) == ['select 1\n']
+    assert list(parse_statements("-- c\nselect 1")) == ['select 1']
+    assert list(parse_statements(" \n")) == []
+
     with pytest.raises(ValueError):
         list(parse_statements('select ());'))
 
@@ -196,6 +230,8 @@ def test_parse_connect_string() -> None:
 
     with pytest.raises(ValueError):
         parse_connect_string(r" host = ")
+    res = parse_connect_string("password='" + "\\" * 5001)
+    assert res == [('password', "'" + "\\" * 2501)]
 
 
 def test_merge_connect_string() -> None:
@@ -1,11 +1,12 @@
 
-from typing import Dict, Any
+from typing import Any, Dict, List
 
 import pytest
 
 from skytools.querybuilder import ( # type: ignore[attr-defined]
     PARAM_DBAPI, PARAM_INLINE, PARAM_PLPY,
-    PlanCache, QueryBuilder, plpy, plpy_exec,
+    PlanCache, PLPyQueryBuilder, QueryBuilder, plpy, plpy_exec,
+    scan_template, scan_template_py,
 )
 
 
@@ -54,6 +55,26 @@ def test_querybuilder_parse_errors() -> None:
         QueryBuilder("values ({id||})", args)
 
 
+def test_scan_template_impl() -> None:
+    data = [
+        '', 'select 1', '{a}', 'x {a:int4} y {b|DEFAULT} z {c:text|NULL}',
+        'a \u00e9{x}\U0001d11e', '{a', '{}', '{:int}', '{a:}', '{a|}',
+        '{a::b}', '{{a}', '{a|b:c}', '{a:b|c|d}', 'x}y',
+    ]
+    for s in data:
+        p: object
+        c: object
+        try:
+            p = scan_template_py(s)
+        except ValueError as ex:
+            p = str(ex)
+        try:
+            c = scan_template(s)
+        except ValueError as ex:
+            c = str(ex)
+        assert p == c
+
+
 def test_querybuilder_inline() -> None:
     from decimal import Decimal
     args = {
@@ -75,6 +96,23 @@ def test_querybuilder_altsql() -> None:
         QueryBuilder("values ({missing|DEFAULT})", None)
 
 
+def test_plpy_querybuilder_sqls() -> None:
+    sqls: List[Dict[str, str]] = []
+    q = PLPyQueryBuilder("select {a}, {b:int4}", {'a': 'x', 'b': 2}, sqls=sqls)
+    plpy.log.clear()
+    q.execute()
+    assert sqls == [{"sql": "select 'x', '2'"}]
+    assert plpy.log == [
+        "DBG: plpy.prepare('select $1, $2', ['text', 'int4'])",
+        "DBG: plpy.execute(('PLAN', 'select $1, $2', ['text', 'int4']), ['x', 2])",
+    ]
+    assert q.get_sql(PARAM_PLPY) == "select $1, $2"
+
+    q.add(" where {a}")
+    assert q.get_sql(PARAM_INLINE) == "select 'x', '2' where 'x'"
+    assert q.get_sql(PARAM_PLPY) == "select $1, $2 where $3"
+
+
 def test_plpy_exec() -> None:
     GD: Dict[str, Any] = {}
     plpy.log.clear()
@@ -315,6 +315,9 @@ def test_json_encode() -> None:
     assert json_encode('a') == '"a"'
     assert json_encode(['a']) == '["a"]'
     assert json_encode(a=1) == '{"a": 1}'
+    assert json_encode() == '{}'
+    assert json_encode(0) == '0'
+    assert json_encode([]) == '[]'
 
 
 def test_json_decode() -> None:
@@ -1,9 +1,12 @@
 
+import errno
+import optparse
 import os
 import signal
 import sys
 import time
 import pathlib
+from typing import Optional
 
 import pytest
 
@@ -59,6 +62,128 @@ def test_bg_process(tmp_path: pathlib.Path) -> None:
     assert not checklog(logfile, "STEP3")
 
 
+def test_stale_pidfile(tmp_path: pathlib.Path, capsys: pytest.CaptureFixture[str]) -> None:
+    pidfile = str(tmp_path / "proc.pid")
+    logfile = str(tmp_path / "proc.log")
+
+    # empty pidfile is left over by crash
+    with open(pidfile, "w"):
+        pass
+    run_single_process(Runner(logfile, "STEP1"), False, pidfile)
+    assert "Ignoring stale pidfile" in capsys.readouterr().out
+    assert checklog(logfile, "STEP1")
+    assert not os.path.exists(pidfile)
+
+
+class PidRunner(Runner):
+    def __init__(self, logfile: str, pidfile: str) -> None:
+        super().__init__(logfile, "")
+        self.pidfile = pidfile
+
+    def run(self) -> None:
+        with open(self.pidfile) as f:
+            self.word = f.read()
+        super().run()
+
+
+@pytest.mark.parametrize("no_fcntl", [False, True])
+def test_fresh_pidfile(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, no_fcntl: bool) -> None:
+    pidfile = str(tmp_path / "proc.pid")
+    logfile = str(tmp_path / "proc.log")
+
+    # win32 path
+    if no_fcntl:
+        monkeypatch.setattr(skytools.scripting, "fcntl", None)
+
+    run_single_process(PidRunner(logfile, pidfile), False, pidfile)
+    with open(logfile) as f:
+        assert f.read() == "%d\n" % os.getpid()
+    assert os.listdir(str(tmp_path)) == ["proc.log"]
+
+
+@pytest.mark.skipif(WIN32, reason="no flock on win32")
+def test_locked_pidfile(tmp_path: pathlib.Path) -> None:
+    import fcntl
+    pidfile = str(tmp_path / "proc.pid")
+    logfile = str(tmp_path / "proc.log")
+
+    # pid is dead, but lock is held
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    with open(pidfile, "w") as f:
+        f.write(str(pid))
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        with pytest.raises(SystemExit):
+            run_single_process(Runner(logfile, "STEP1"), False, pidfile)
+    assert not os.path.exists(logfile)
+
+
+@pytest.mark.skipif(WIN32, reason="no flock on win32")
+def test_pidfile_no_locking(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import fcntl
+    pidfile = str(tmp_path / "proc.pid")
+    logfile = str(tmp_path / "proc.log")
+
+    # filesystem without lock support
+    def flock(fd: int, op: int) -> None:
+        raise OSError(errno.ENOLCK, os.strerror(errno.ENOLCK))
+
+    monkeypatch.setattr(fcntl, "flock", flock)
+
+    run_single_process(Runner(logfile, "STEP1"), False, pidfile)
+    assert checklog(logfile, "STEP1")
+
+    # stale one is taken over
+    with open(pidfile, "w"):
+        pass
+    run_single_process(Runner(logfile, "STEP2"), False, pidfile)
+    assert checklog(logfile, "STEP2")
+    assert os.listdir(str(tmp_path)) == ["proc.log"]
+
+
+@pytest.mark.skipif(WIN32, reason="no flock on win32")
+def test_stale_pidfile_takeover(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pidfile = str(tmp_path / "proc.pid")
+    logfile = str(tmp_path / "proc.log")
+
+    # slow, staggered liveness check, so all starters see stale file
+    # and finish checking one after another
+    signal_pidfile = skytools.signal_pidfile
+    delay = [0.0]
+
+    def slow_signal_pidfile(fn: str, sig: int) -> bool:
+        res = signal_pidfile(fn, sig)
+        time.sleep(delay[0])
+        return res
+
+    monkeypatch.setattr(skytools, "signal_pidfile", slow_signal_pidfile)
+
+    # several starters race for same stale pidfile
+    with open(pidfile, "w"):
+        pass
+    pids = []
+    for i in range(4):
+        pid = os.fork()
+        if pid == 0:
+            delay[0] = 0.2 + 0.2 * i
+            code = 0
+            try:
+                run_single_process(Runner(logfile, "RUN", 2), False, pidfile)
+            except SystemExit:
+                code = 1
+            os._exit(code)
+        pids.append(pid)
+
+    codes = [os.waitpid(pid, 0)[1] for pid in pids]
+    assert sorted(codes) == [0, 256, 256, 256]
+    with open(logfile) as f:
+        assert f.read() == "RUN\n"
+    assert not os.path.exists(pidfile)
+    assert os.listdir(str(tmp_path)) == ["proc.log"]
+
+
 class OptScript(skytools.BaseScript):
     ARGPARSE = False
     looping = 0
@@ -89,6 +214,26 @@ def test_argparse_script(capsys: pytest.CaptureFixture[str]) -> None:
     assert "display" in res.out
 
 
+class ExtraOptScript(OptScript):
+    def init_optparse(self, parser: Optional[optparse.OptionParser] = None) -> optparse.OptionParser:
+        p = super().init_optparse(parser)
+        p.add_option("--extra", action="store_true")
+        return p
+
+
+def test_parser_reuse() -> None:
+    s1 = OptScript("testscript", ["-v", CONF])
+    s2 = OptScript("testscript", [CONF])
+    assert s1.options.verbose == 1
+    assert s2.options.verbose is None
+
+    # overridden init_optparse gets fresh parser each time
+    s3 = ExtraOptScript("testscript", ["--extra", CONF])
+    s4 = ExtraOptScript("testscript", [CONF])
+    assert s3.options.extra
+    assert not s4.options.extra
+
+
 @pytest.mark.skipif(WIN32, reason="use signals on win32")
 def test_optparse_signals(capsys: pytest.CaptureFixture[str]) -> None:
     with pytest.raises(SystemExit):
@@ -159,3 +304,20 @@ def test_get_database(capsys: pytest.CaptureFixture[str]) -> None:
     res = capsys.readouterr()
     assert "OK" in res.out
 
+
+def test_connect_string_profile() -> None:
+    s = DBScript("testscript", ["--set", "prof_extra_connstr=sslmode=disable", CONF])
+    assert s.add_connect_string_profile("dbname=x", "prof") == "dbname=x sslmode=disable"
+    assert s.add_connect_string_profile("dbname=y", "prof") == "dbname=y sslmode=disable"
+    assert s.add_connect_string_profile("dbname=x", "other") == "dbname=x"
+    assert s.add_connect_string_profile("dbname=x", None) == "dbname=x"
+
+
+def test_print_ini(capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit):
+        DBScript("testscript", ["--ini", "--set", "connection_lifetime=30", CONF])
+    res = capsys.readouterr()
+    assert res.out.startswith("[testscript]\n")
+    assert "#connection_lifetime = 1200\nconnection_lifetime = 30\n" in res.out
+    assert "\nloop_delay = 1.0\n" in res.out
+    assert res.out.index("connection_lifetime") < res.out.index("loop_delay")